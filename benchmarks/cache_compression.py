@@ -0,0 +1,64 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Hit latency versus disk footprint of cache compression, per namespace.
+
+Copies the entries of each existing cache namespace (run the server or tests
+first to populate them) into scratch caches at several compression levels.
+
+    uv run python benchmarks/cache_compression.py [--levels 0,1,6,9]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from platformdirs import user_cache_dir
+
+from mcp_nix.cache import Cache, CompressedDisk
+
+
+def measure(entries: dict, level: int, rounds: int) -> tuple[int, float]:
+    """Return (disk bytes, mean hit latency in ms) for entries stored at level."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = Cache(tmpdir, disk=CompressedDisk.at_level(level))
+        for key, value in entries.items():
+            cache.set(key, value)
+        volume = cache.volume()
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for key in entries:
+                cache.get(key)
+        latency = (time.perf_counter() - start) / (rounds * len(entries)) * 1000
+        cache.close()
+    return volume, latency
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="0,1,6,9")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--dir", default=user_cache_dir("mcp-nix"))
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    print(f"{'namespace':<12} {'entries':>7} {'level':>5} {'disk MB':>9} {'ratio':>6} {'hit ms':>8}")
+    for name in sorted(os.listdir(args.dir)):
+        source = Cache(os.path.join(args.dir, name), disk=CompressedDisk)
+        entries = {key: source.get(key) for key in source.iterkeys()}
+        entries = {key: value for key, value in entries.items() if value is not None}
+        source.close()
+        if not entries:
+            continue
+
+        baseline = None
+        for level in levels:
+            volume, latency = measure(entries, level, args.rounds)
+            baseline = baseline or volume
+            print(
+                f"{name:<12} {len(entries):>7} {level:>5} {volume / 1e6:>9.2f} {baseline / volume:>5.1f}x {latency:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Micro-benchmark for mcp_nix.utils.html_to_text over real option descriptions.
+
+Uses the raw (HTML) descriptions of a Home Manager release, or a JSON list of
+strings given with --file.
+
+    uv run python benchmarks/html_to_text.py [--release master] [--file descriptions.json]
+"""
+
+import argparse
+import json
+import time
+
+from bs4 import BeautifulSoup
+
+from mcp_nix.homemanager import OPTIONS_BASE_URL, _cache
+from mcp_nix.utils import html_to_text
+
+
+def load_descriptions(release: str) -> list[str]:
+    url = f"{OPTIONS_BASE_URL}/options-{release}.json"
+    return _cache.request(url, lambda r: [opt.get("description") or "" for opt in r.json().get("options", [])])
+
+
+def beautifulsoup(html: str) -> str:
+    if not html:
+        return ""
+    return BeautifulSoup(html, "html.parser").get_text(separator=" ").strip()
+
+
+def bench(name: str, fn, descriptions: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html in descriptions:
+            fn(html)
+    elapsed = (time.perf_counter() - start) / rounds
+    per_item = elapsed / len(descriptions) * 1e6
+    print(f"{name:<24} {elapsed * 1000:9.1f} ms/pass {per_item:8.2f} us/description")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--release", default="master")
+    parser.add_argument("--file", help="JSON list of HTML descriptions")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            descriptions = json.load(f)
+    else:
+        descriptions = load_descriptions(args.release)
+
+    with_markup = sum(1 for d in descriptions if "<" in d or "&" in d)
+    print(f"{len(descriptions)} descriptions, {with_markup} with markup or entities\n")
+
+    mismatches = sum(1 for d in descriptions if beautifulsoup(d) != html_to_text.__wrapped__(d))
+    print(f"mismatches against BeautifulSoup: {mismatches}\n")
+
+    baseline = bench("beautifulsoup", beautifulsoup, descriptions, args.rounds)
+    uncached = bench("html_to_text (no LRU)", html_to_text.__wrapped__, descriptions, args.rounds)
+    html_to_text.cache_clear()
+    for d in descriptions:
+        html_to_text(d)
+    cached = bench("html_to_text (warm LRU)", html_to_text, descriptions, args.rounds)
+
+    print(f"\nspeedup: {baseline / uncached:.1f}x uncached, {baseline / cached:.1f}x warm")
+
+
+if __name__ == "__main__":
+    main()
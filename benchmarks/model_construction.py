@@ -0,0 +1,65 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Benchmark building a 500-child show_option_details response from Home Manager data.
+
+Compares validating raw records on every hit (the previous behaviour) with
+handing out models validated once at ingest.
+
+    uv run python benchmarks/model_construction.py [--release master] [--children 500]
+"""
+
+import argparse
+import time
+
+from mcp_nix.homemanager import OPTIONS_BASE_URL, _cache
+from mcp_nix.models import HomeManagerOption
+from mcp_nix.options import HomeManagerOptionsBackend
+from mcp_nix.utils import html_to_text, render_html_fields
+
+
+def load_raw_options(release: str) -> list[dict]:
+    url = f"{OPTIONS_BASE_URL}/options-{release}.json"
+    return _cache.request(url, lambda r: r.json().get("options", []))
+
+
+def respond(options: list[HomeManagerOption]) -> str:
+    backend = HomeManagerOptionsBackend()
+    return "\n\n".join(backend._to_unified(opt).format_short() for opt in options)
+
+
+def bench(name: str, fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{name:<30} {elapsed * 1000:8.2f} ms/response")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--release", default="master")
+    parser.add_argument("--children", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    raw = load_raw_options(args.release)[: args.children]
+    ingested = [HomeManagerOption.model_validate(render_html_fields(opt, ("description",))) for opt in raw]
+    print(f"{len(raw)} child options\n")
+
+    def validate_per_hit() -> list[HomeManagerOption]:
+        html_to_text.cache_clear()
+        return [HomeManagerOption.model_validate(render_html_fields(opt, ("description",))) for opt in raw]
+
+    def ingested_models() -> list[HomeManagerOption]:
+        return list(ingested)
+
+    baseline = bench("models (validate per hit)", validate_per_hit, args.rounds)
+    bench("models (validated at ingest)", ingested_models, args.rounds)
+    full_baseline = bench("response (validate per hit)", lambda: respond(validate_per_hit()), args.rounds)
+    full = bench("response (validated at ingest)", lambda: respond(ingested_models()), args.rounds)
+
+    print(f"\nper-response model cost removed: {baseline * 1000:.2f} ms ({full_baseline / full:.1f}x faster response)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Benchmark for mcp_nix.nix_nomad._parse_options against a BeautifulSoup reference.
+
+Parses the nix-nomad manual page, fetched through the cache or read from a saved
+copy given with --file, and checks both parsers extract the same options.
+
+    uv run python benchmarks/nix_nomad_parser.py [--file nix-nomad.html] [--rounds 3]
+"""
+
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from mcp_nix.nix_nomad import NIX_NOMAD_URL, NixNomadOption, _cache, _parse_options
+
+
+def beautifulsoup(html: str) -> dict[str, NixNomadOption]:
+    """The previous BeautifulSoup implementation of _parse_options, kept as the reference."""
+    soup = BeautifulSoup(html, "html.parser")
+    options: dict[str, NixNomadOption] = {}
+
+    # Find all option entries in the variablelist
+    # Structure: <dl class="variablelist"><dt>...<a id="opt-{name}">...
+    for dt in soup.find_all("dt"):
+        # Get option name from the anchor id or code element
+        anchor = dt.find("a", id=lambda x: x and x.startswith("opt-"))
+        if not anchor:
+            continue
+
+        code = dt.find("code", class_="option")
+        if not code:
+            continue
+
+        name = code.get_text(strip=True)
+        if not name:
+            continue
+
+        # Get the corresponding dd element
+        dd = dt.find_next_sibling("dd")
+        if not dd:
+            continue
+
+        # Parse fields from dd
+        option_type = ""
+        description = ""
+        default = ""
+        example = ""
+
+        # Process paragraphs
+        paragraphs = dd.find_all("p", recursive=False)
+        for i, p in enumerate(paragraphs):
+            text = p.get_text(strip=True)
+            em = p.find("em")
+
+            if em:
+                em_text = em.get_text(strip=True)
+                if em_text == "Type:":
+                    # Type is the rest of the paragraph
+                    em.decompose()
+                    option_type = p.get_text(strip=True)
+                elif em_text == "Default:":
+                    # Default may be in a code block or literal
+                    em.decompose()
+                    code_block = p.find("code")
+                    default = code_block.get_text(strip=True) if code_block else p.get_text(strip=True)
+                elif em_text == "Example:":
+                    # Example may be in a pre block following this p
+                    em.decompose()
+                    pre = p.find_next_sibling("pre")
+                    if pre:
+                        example = pre.get_text(strip=True)
+                    else:
+                        code_block = p.find("code")
+                        example = code_block.get_text(strip=True) if code_block else p.get_text(strip=True)
+                elif em_text == "Declared by:":
+                    pass  # Skip declaration info
+            elif i == 0 and not text.startswith(("Type:", "Default:", "Example:", "Declared by:")):
+                # First paragraph without em label is the description
+                description = text
+
+        options[name] = NixNomadOption(
+            name=name,
+            type=option_type,
+            description=description,
+            default=default,
+            example=example,
+        )
+
+    return options
+
+
+def bench(name: str, fn, html: str, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(html)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{name:<16} {elapsed * 1000:9.1f} ms/pass")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="Saved copy of the nix-nomad manual page")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            html = f.read()
+    else:
+        html = _cache.request(NIX_NOMAD_URL, lambda r: r.text)
+
+    expected = beautifulsoup(html)
+    actual = _parse_options(html)
+    mismatches = sum(1 for name in expected.keys() | actual.keys() if expected.get(name) != actual.get(name))
+    print(f"{len(html) / 1024:.0f} KiB, {len(expected)} options")
+    print(f"mismatches against BeautifulSoup: {mismatches}\n")
+
+    baseline = bench("beautifulsoup", beautifulsoup, html, args.rounds)
+    streaming = bench("_parse_options", _parse_options, html, args.rounds)
+
+    print(f"\nspeedup: {baseline / streaming:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
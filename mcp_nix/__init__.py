@@ -3,9 +3,14 @@
 
 import argparse
 import os
+import sys
+import threading
+import time
 
 from fastmcp import FastMCP
 
+from .cache import APIError
+
 mcp = FastMCP("mcp-nix")
 
 # All available tools (flat list, all enabled by default)
@@ -20,11 +25,17 @@ ALL_TOOLS = [
     "read_option_declaration",
     # NixHub
     "find_nixpkgs_commit_with_package_version",
+    "find_nixpkgs_commit_with_package_versions",
     # Noogle
     "search_nix_stdlib",
     "help_for_stdlib_function",
 ]
 
+# Tools served by each group of caches, for warming only what is enabled
+NIXPKGS_TOOLS = {"search_nixpkgs", "read_derivation"}
+OPTION_TOOLS = {"search_options", "list_versions", "show_option_details", "read_option_declaration"}
+NOOGLE_TOOLS = {"search_nix_stdlib", "help_for_stdlib_function"}
+
 
 def parse_args() -> argparse.Namespace:
     """Parse CLI arguments."""
@@ -37,6 +48,52 @@ def parse_args() -> argparse.Namespace:
         default="",
         help=f"Comma-separated list of tool names to exclude. Available: {', '.join(ALL_TOOLS)}",
     )
+    parser.add_argument(
+        "--local-nixpkgs",
+        action="store_true",
+        help="Serve nixpkgs source reads from a local tarball, downloaded once per channel commit",
+    )
+    parser.add_argument(
+        "--local-options",
+        action="store_true",
+        help="Answer option queries from local indexes, built once per upstream revision",
+    )
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="Preload caches and search indexes in the background on startup",
+    )
+
+    parser.add_argument(
+        "--offline",
+        type=str,
+        metavar="SNAPSHOT",
+        default=None,
+        help="Serve all tools from a snapshot file (see export-snapshot), without network access",
+    )
+
+    commands = parser.add_subparsers(dest="command")
+    warm_parser = commands.add_parser("warm", help="Fetch and build all caches and search indexes, then exit")
+    warm_parser.add_argument(
+        "--projects",
+        type=str,
+        default="",
+        help="Comma-separated list of option projects to warm (default: all)",
+    )
+    export_parser = commands.add_parser("export-snapshot", help="Write every dataset to a snapshot file for --offline")
+    export_parser.add_argument("path", help="Snapshot file to write")
+    export_parser.add_argument(
+        "--channels",
+        type=str,
+        default="",
+        help="Comma-separated list of NixOS channels to include (default: the current stable channel)",
+    )
+    export_parser.add_argument("--no-packages", action="store_true", help="Leave out nixpkgs package documents")
+    export_parser.add_argument(
+        "--noogle-pages",
+        action="store_true",
+        help="Include every Noogle function page, for help_for_stdlib_function",
+    )
 
     # Deprecated flags - kept for backwards compatibility, silently ignored
     parser.add_argument("--nixpkgs", action=argparse.BooleanOptionalAction, default=None, help=argparse.SUPPRESS)
@@ -71,10 +128,95 @@ def validate_tool_names(names: set[str], arg_name: str) -> None:
             raise SystemExit(1)
 
 
+def run_warm(projects: str) -> None:
+    """Warm the caches and print timing per artifact."""
+    from .options import SUPPORTED_PROJECTS
+    from .warm import warm
+
+    selected = parse_tool_list(projects)
+    for name in selected:
+        if name not in SUPPORTED_PROJECTS:
+            print(f"Error: Unknown project '{name}' in --projects. Available: {', '.join(SUPPORTED_PROJECTS)}")
+            raise SystemExit(1)
+
+    start = time.perf_counter()
+    results = warm(sorted(selected) if selected else None, on_result=print)
+    failed = sum(1 for result in results if result.error)
+    print(f"Warmed {len(results) - failed}/{len(results)} artifacts in {time.perf_counter() - start:.2f}s")
+    if failed:
+        raise SystemExit(1)
+
+
+def run_export_snapshot(args: argparse.Namespace) -> None:
+    """Export a snapshot and print timing per dataset."""
+    from .snapshot import export
+
+    try:
+        export(
+            args.path,
+            channels=sorted(parse_tool_list(args.channels)) or None,
+            packages=not args.no_packages,
+            noogle_pages=args.noogle_pages,
+            on_progress=print,
+        )
+    except APIError as e:
+        print(f"Error: {e}")
+        raise SystemExit(1) from e
+
+
+def _warm_in_background(included_tools: set[str]) -> None:
+    """Warm the caches of the enabled tools without delaying startup.
+
+    Reports go to stderr, stdout carries the protocol.
+    """
+    from .options import SUPPORTED_PROJECTS
+    from .warm import warm
+
+    projects = set(SUPPORTED_PROJECTS) if included_tools & OPTION_TOOLS else set()
+    if included_tools & NIXPKGS_TOOLS:
+        projects.add("nixos")  # Channels and their commits
+    noogle = bool(included_tools & NOOGLE_TOOLS)
+    if not projects and not noogle:
+        return
+
+    def report(result) -> None:
+        if result.error:
+            print(f"mcp-nix: warm-up of {result.artifact} failed: {result.error}", file=sys.stderr)
+
+    threading.Thread(
+        target=warm,
+        kwargs={"projects": sorted(projects), "noogle": noogle, "on_result": report},
+        name="mcp-nix-warm",
+        daemon=True,
+    ).start()
+
+
 def main() -> None:
     """Run the MCP server."""
     args = parse_args()
 
+    if args.command == "export-snapshot":
+        run_export_snapshot(args)
+        return
+
+    if args.offline:
+        from .snapshot import activate
+
+        try:
+            activate(args.offline)
+        except APIError as e:
+            print(f"Error: {e}")
+            raise SystemExit(1) from e
+
+    if args.local_options:
+        from . import option_index
+
+        option_index.enable()
+
+    if args.command == "warm":
+        run_warm(args.projects)
+        return
+
     # Parse and validate exclude list
     exclude = parse_tool_list(args.exclude)
     validate_tool_names(exclude, "--exclude")
@@ -82,8 +224,17 @@ def main() -> None:
     # All tools enabled by default, minus excluded ones
     included_tools = set(ALL_TOOLS) - exclude
 
+    if args.local_nixpkgs:
+        from . import tarball
+
+        # Offline, only tarballs downloaded beforehand are used
+        tarball.enable(download=not args.offline)
+
     from . import tools as _tools  # noqa: F401
 
+    if args.warm:
+        _warm_in_background(included_tools)
+
     for tool in ALL_TOOLS:
         if tool not in included_tools:
             mcp.remove_tool(tool)
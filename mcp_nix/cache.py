@@ -1,12 +1,23 @@
 """Shared caching utilities using diskcache."""
 
+import functools
+import hashlib
 import json
-from collections.abc import Callable
-from dataclasses import dataclass
+import pickle
+import sys
+import threading
+import time
+import types
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
 import diskcache
 import requests
+from diskcache.core import UNKNOWN
 from platformdirs import user_cache_dir
 from requests.structures import CaseInsensitiveDict
 
@@ -15,12 +26,32 @@ if TYPE_CHECKING:
 
 DEFAULT_EXPIRE = 60 * 60  # 1 hour
 DEFAULT_TIMEOUT = 5  # Aggressive timeout - most APIs respond quickly
+DEFAULT_COMPRESS_LEVEL = 6
+COMPRESS_THRESHOLD = 1024  # Pickled values smaller than this are stored as-is
+DEFAULT_MEMORY_LIMIT = 32 * 1024 * 1024  # Bytes of values and their parsed results kept in memory per namespace
+_BLOCK_SIZE = 80  # Average bytes per allocated block, measured on parsed options and indexes
 
 
 class APIError(Exception):
     """Custom exception for API-related errors."""
 
 
+# Hooks for offline snapshots, see snapshot.py. The recorder sees every response
+# handed to a callback; the replayer serves responses instead of the network and disk.
+_recorder: "Callable[[str, CachedResponse], None] | None" = None
+_replayer: "Callable[[str], CachedResponse] | None" = None
+
+
+def set_recorder(recorder: "Callable[[str, CachedResponse], None] | None") -> None:
+    global _recorder
+    _recorder = recorder
+
+
+def set_replayer(replayer: "Callable[[str], CachedResponse] | None") -> None:
+    global _replayer
+    _replayer = replayer
+
+
 @dataclass
 class CachedResponse:
     """Cacheable HTTP response with parsing helpers."""
@@ -52,12 +83,248 @@ class CachedResponse:
         return self.headers.get("content-type", "").lower()
 
 
+class CompressedDisk(diskcache.Disk):
+    """diskcache Disk that zlib-compresses pickled values.
+
+    Compressed values are stored as bytes with a marker prefix, so entries written
+    before compression was enabled are still read back as plain pickles.
+    """
+
+    MARKER = b"mcp-nix:zlib:"
+    # A class attribute rather than a disk_ setting: diskcache stores those in the
+    # cache directory and passes them to any Disk that opens it, which plain
+    # diskcache.Disk rejects.
+    compress_level = DEFAULT_COMPRESS_LEVEL
+
+    @classmethod
+    def at_level(cls, compress_level: int) -> type["CompressedDisk"]:
+        """Get a CompressedDisk class compressing at compress_level."""
+        if compress_level == cls.compress_level:
+            return cls
+        return type(cls.__name__, (cls,), {"compress_level": compress_level})
+
+    def store(self, value, read, key=UNKNOWN):
+        if self.compress_level and not read and not isinstance(value, (bytes, str, int, float)):
+            data = pickle.dumps(value, protocol=self.pickle_protocol)
+            if len(data) >= COMPRESS_THRESHOLD:
+                value = self.MARKER + zlib.compress(data, self.compress_level)
+        return super().store(value, read, key=key)
+
+    def fetch(self, mode, filename, value, read):
+        data = super().fetch(mode, filename, value, read)
+        if isinstance(data, bytes) and data.startswith(self.MARKER):
+            return pickle.loads(zlib.decompress(data[len(self.MARKER) :]))
+        return data
+
+
+def _response_token(response: CachedResponse) -> str:
+    """Identify a response by its content."""
+    return hashlib.sha256(response.content).hexdigest()
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate the memory held by a cached value, by its payload size."""
+    if isinstance(value, CachedResponse):
+        return len(value.content)
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+def _allocating[T](fn: Callable[[], T]) -> tuple[T, int]:
+    """Run fn, estimating the memory its result holds by the interpreter blocks left allocated.
+
+    Walking parsed option lists and indexes would cost about as much as building
+    them, while counting blocks is free. Allocations made by other threads at the
+    same time are counted too, so this is only an estimate.
+    """
+    blocks = sys.getallocatedblocks()
+    result = fn()
+    return result, max(sys.getallocatedblocks() - blocks, 0) * _BLOCK_SIZE
+
+
+def _callback_key(callback: Callable) -> Hashable | None:
+    """Identify a callback by its code and closure, or None if its result can't be memoized.
+
+    Partials and bound methods are identified by their function and bound arguments.
+    """
+    if isinstance(callback, functools.partial):
+        func_key = _callback_key(callback.func)
+        key = None if func_key is None else (func_key, callback.args, tuple(sorted(callback.keywords.items())))
+    elif isinstance(callback, types.MethodType):
+        func_key = _callback_key(callback.__func__)
+        key = None if func_key is None else (func_key, callback.__self__)
+    else:
+        code = getattr(callback, "__code__", None)
+        if code is None:
+            return None
+        try:
+            cells = tuple(cell.cell_contents for cell in getattr(callback, "__closure__", None) or ())
+        except ValueError:  # Empty cell
+            return None
+        key = (code, cells)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+@functools.cache
+def _code_version() -> str:
+    """Identify the code of the installed mcp-nix by hashing its modules."""
+    digest = hashlib.sha256()
+    package = Path(__file__).parent
+    for path in sorted(package.glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _derivation_id(callback: Callable) -> tuple[str, str, str]:
+    """Identify what a derived result was computed with: the callback, its code, and mcp-nix's code."""
+    func = callback
+    while isinstance(func, (functools.partial, types.MethodType)):
+        func = func.func if isinstance(func, functools.partial) else func.__func__
+    name = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', type(func).__qualname__)}"
+    code = getattr(func, "__code__", None)
+    code_hash = hashlib.sha256(code.co_code).hexdigest()[:16] if code else ""
+    return name, code_hash, _code_version()
+
+
+@dataclass
+class _MemoryEntry:
+    value: Any
+    expire_at: float | None
+    size: int  # Of the value and the results
+    results: dict[Hashable, Any] = field(default_factory=dict)
+    key: Hashable = None  # Key in the memory tier, None if the entry isn't kept there
+
+
+class MemoryTier:
+    """In-process LRU in front of the disk cache, bounded by the size of the values it holds.
+
+    Each entry also keeps the results of callbacks run on its value, counted in its
+    size, so hot keys neither touch disk nor re-run parsing.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, _MemoryEntry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> _MemoryEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expire_at is not None and entry.expire_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, value: Any, expire_at: float | None, size: int = 0) -> _MemoryEntry | None:
+        """Keep a value in memory, evicting the least recently used. Returns None if it is too large.
+
+        size is the value's memory if known, e.g. from _allocating, else it is estimated.
+        """
+        size = max(size, _sizeof(value))
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return None
+            entry = _MemoryEntry(value=value, expire_at=expire_at, size=size, key=key)
+            self._entries[key] = entry
+            self._size += size
+            self._evict()
+            return entry
+
+    def apply(self, entry: _MemoryEntry, callback: Callable, callback_key: Hashable | None) -> Any:
+        """Run callback on an entry's value, reusing its memoized result.
+
+        Memoized results are shared by every caller of the same callback and must not
+        be mutated. A result is only memoized while its entry fits the budget with it.
+        """
+        if callback_key is not None:
+            with self._lock:
+                if callback_key in entry.results:
+                    return entry.results[callback_key]
+        result, size = _allocating(lambda: callback(entry.value))
+        if callback_key is None or entry.key is None:
+            return result
+        with self._lock:
+            if (
+                self._entries.get(entry.key) is entry
+                and callback_key not in entry.results
+                and entry.size + size <= self.max_bytes
+            ):
+                entry.results[callback_key] = result
+                entry.size += size
+                self._size += size
+                self._entries.move_to_end(entry.key)
+                self._evict()
+        return result
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+
 class Cache(diskcache.Cache):
-    """Extended diskcache.Cache with helper methods."""
+    """Extended diskcache.Cache with helper methods and an in-memory tier."""
+
+    def __init__(
+        self,
+        directory=None,
+        timeout=60,
+        disk=diskcache.Disk,
+        *,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        **settings,
+    ):
+        super().__init__(directory, timeout, disk, **settings)
+        self.memory = MemoryTier(memory_limit)
+
+    def set(self, key, value, expire=None, read=False, tag=None, retry=False):
+        self.memory.delete(key)
+        return super().set(key, value, expire=expire, read=read, tag=tag, retry=retry)
+
+    def delete(self, key, retry=False):
+        self.memory.delete(key)
+        return super().delete(key, retry=retry)
+
+    def clear(self, retry=False):
+        self.memory.clear()
+        return super().clear(retry=retry)
+
+    def _entry(self, key: Hashable) -> _MemoryEntry | None:
+        """Look a key up in the memory tier, then on disk, keeping disk hits in memory."""
+        entry = self.memory.get(key)
+        if entry is None:
+            (value, expire_at), size = _allocating(lambda: self.get(key, expire_time=True))
+            if value is not None:
+                entry = self.memory.set(key, value, expire_at, size) or _MemoryEntry(value, expire_at, 0)
+        return entry
 
     def get_or_set[T, R](
         self,
-        key: str,
+        key: Hashable,
         factory: Callable[[], T],
         callback: Callable[[T], R],
         expire: float | None = DEFAULT_EXPIRE,
@@ -67,20 +334,27 @@ class Cache(diskcache.Cache):
         If callback fails with cached value, invalidates cache and retries once
         with a fresh value. This allows the callback to serve as validation -
         incompatible cached values are automatically recovered.
+
+        Values are kept in the memory tier along with the callback's result, so
+        callbacks must only depend on the value and their closure. The result is
+        shared with every other caller and must not be mutated.
         """
+        callback_key = _callback_key(callback)
+
         for attempt in range(2):
             if attempt == 0:
-                cached = self.get(key)
-                if cached is not None:
+                entry = self._entry(key)
+                if entry is not None:
                     try:
-                        return callback(cached)
+                        return self.memory.apply(entry, callback, callback_key)
                     except Exception:
                         self.delete(key)
                         continue
 
-            fresh = factory()
+            fresh, size = _allocating(factory)
             self.set(key, fresh, expire=expire)
-            return callback(fresh)
+            entry = self.memory.set(key, fresh, time.time() + expire if expire is not None else None, size)
+            return self.memory.apply(entry or _MemoryEntry(fresh, None, 0), callback, callback_key)
 
         # Should never reach here, but satisfy type checker
         raise RuntimeError("Unreachable")  # pragma: no cover
@@ -99,6 +373,14 @@ class Cache(diskcache.Cache):
         If callback fails with cached value, invalidates and retries with fresh.
         The callback serves as both transformation and validation.
         """
+        if _replayer is not None:
+            return self._replay(url, callback)
+        if _recorder is not None:
+            recorder, transform = _recorder, callback
+
+            def callback(r: CachedResponse) -> R:
+                recorder(url, r)
+                return transform(r)
 
         def factory() -> CachedResponse:
             try:
@@ -109,16 +391,100 @@ class Cache(diskcache.Cache):
             except requests.HTTPError as exc:
                 raise APIError(f"Request failed ({exc.response.status_code}): {url}") from exc
 
-            return CachedResponse(
+            response = CachedResponse(
                 content=resp.content,
                 status_code=resp.status_code,
                 headers=resp.headers,
                 url=str(resp.url),
             )
+            self.set((url, "token"), _response_token(response), expire=expire)
+            return response
 
         return self.get_or_set(url, factory, callback=callback, expire=expire)
 
+    def _replay[R](self, url: str, callback: Callable[[CachedResponse], R]) -> R:
+        """Serve a request from the replayer, keeping the response in the memory tier."""
+        key = ("replay", url)
+        entry = self.memory.get(key)
+        if entry is None:
+            response = _replayer(url)  # type: ignore[misc]
+            entry = self.memory.set(key, response, None) or _MemoryEntry(response, None, 0)
+        return self.memory.apply(entry, callback, _callback_key(callback))
+
+    def token(
+        self, url: str, *, expire: float | None = DEFAULT_EXPIRE, timeout: int = DEFAULT_TIMEOUT, **kwargs
+    ) -> str | None:
+        """Get the identity of the response for a URL, fetching it like `request` if it isn't cached.
+
+        Only the token stored along with the response is read, not the response or what
+        was derived from it. Replayed responses have no token, as they aren't cached.
+        """
+        if _replayer is not None:
+            return None
+        token_key = (url, "token")
+        entry = self._entry(token_key)
+        if entry is not None:
+            return entry.value
+        token = self.request(url, _response_token, expire=expire, timeout=timeout, **kwargs)
+        # Responses cached before tokens were recorded
+        self.set(token_key, token, expire=expire)
+        return token
+
+    def request_derived[R](
+        self,
+        url: str,
+        callback: Callable[[CachedResponse], R],
+        *,
+        expire: float | None = DEFAULT_EXPIRE,
+        timeout: int = DEFAULT_TIMEOUT,
+        **kwargs,
+    ) -> R:
+        """Fetch URL like `request`, and also cache the callback's result on disk.
+
+        The result is stored along with the identity of the response it was derived
+        from, and is reused for as long as that response is the cached one. The
+        callback only runs again once the response is refetched with new content,
+        or once the callback or any of mcp-nix's code changes. Results must be picklable.
+        """
+        if _replayer is not None or _recorder is not None:
+            # Responses have to go through the snapshot hooks
+            return self.request(url, callback, expire=expire, timeout=timeout, **kwargs)
+
+        token_key = (url, "token")
+        derived_key = (url, "derived", _derivation_id(callback))
+
+        token = self._entry(token_key)
+        if token is not None:
+            try:
+                derived = self._entry(derived_key)
+                if derived is not None:
+                    derived_token, result = derived.value
+                    if derived_token == token.value:
+                        return result
+            except Exception:
+                # Unreadable, e.g. written with classes that have since changed
+                self.delete(derived_key)
+
+        fresh_token, value = self.request(
+            url, lambda r: (_response_token(r), callback(r)), expire=expire, timeout=timeout, **kwargs
+        )
+        if token is None or token.value != fresh_token:
+            # Responses cached before tokens were recorded
+            self.set(token_key, fresh_token, expire=expire)
+        self.set(derived_key, (fresh_token, value), expire=expire)
+        return value
+
+
+def get_cache(
+    name: str, *, compress_level: int = DEFAULT_COMPRESS_LEVEL, memory_limit: int = DEFAULT_MEMORY_LIMIT
+) -> Cache:
+    """Get a cache instance for the given namespace.
 
-def get_cache(name: str) -> Cache:
-    """Get a cache instance for the given namespace."""
-    return Cache(f"{user_cache_dir('mcp-nix')}/{name}")
+    Values are zlib-compressed at compress_level on disk (0 disables compression),
+    and up to memory_limit bytes of them are also kept in memory.
+    """
+    return Cache(
+        f"{user_cache_dir('mcp-nix')}/{name}",
+        disk=CompressedDisk.at_level(compress_level),
+        memory_limit=memory_limit,
+    )
@@ -9,11 +9,12 @@ from lunr.index import Index
 from .cache import DEFAULT_EXPIRE, get_cache
 from .models import HomeManagerOption, HomeManagerRelease, SearchResult
 from .search import APIError, InvalidLimitError
+from .utils import render_html_fields
 
 CONFIG_URL = "https://raw.githubusercontent.com/mipmip/home-manager-option-search/main/config.yaml"
 OPTIONS_BASE_URL = "https://home-manager-options.extranix.com/data"
 
-_cache = get_cache("homemanager")
+_cache = get_cache("homemanager", memory_limit=64 * 1024 * 1024)  # Option dumps for several releases
 
 # In-memory cache for loaded release data (lunr Index can't be serialized)
 _release_cache: dict[str, "ReleaseData"] = {}
@@ -31,9 +32,9 @@ class HomeManagerConfig:
 class ReleaseData:
     """Loaded release data with search index."""
 
-    options: list[dict]
+    options: list[HomeManagerOption]
     index: Index
-    by_title: dict[str, dict] = field(default_factory=dict)
+    by_title: dict[str, HomeManagerOption] = field(default_factory=dict)
 
 
 def get_config() -> HomeManagerConfig:
@@ -45,7 +46,7 @@ def get_config() -> HomeManagerConfig:
         default_release = config.get("params", {}).get("release_current_stable", "master")
         return HomeManagerConfig(releases=releases, default_release=default_release)
 
-    return _cache.request(CONFIG_URL, parse_config)
+    return _cache.request_derived(CONFIG_URL, parse_config)
 
 
 def _is_stable_release(release_value: str) -> bool:
@@ -53,26 +54,43 @@ def _is_stable_release(release_value: str) -> bool:
     return release_value.startswith("release-")
 
 
-def _get_options(release_value: str) -> list[dict]:
-    """Get options for a release, using cache if available."""
-    url = f"{OPTIONS_BASE_URL}/options-{release_value}.json"
-    # Stable releases cached forever, master for 1 hour
-    expire = None if _is_stable_release(release_value) else DEFAULT_EXPIRE
-    return _cache.request(url, lambda r: r.json().get("options", []), expire=expire)
+def _options_url(release_value: str) -> str:
+    return f"{OPTIONS_BASE_URL}/options-{release_value}.json"
 
 
-def _build_index(options: list[dict]) -> tuple[Index, dict[str, dict]]:
+def _options_expire(release_value: str) -> float | None:
+    """Stable releases are cached forever, master for 1 hour."""
+    return None if _is_stable_release(release_value) else DEFAULT_EXPIRE
+
+
+def _get_options(release_value: str) -> list[HomeManagerOption]:
+    """Get options for a release, using cache if available.
+
+    Options are validated and their descriptions rendered from HTML to text here, once
+    per release, so queries hand out these models instead of validating every hit.
+    """
+    url = _options_url(release_value)
+
+    def parse_options(r) -> list[HomeManagerOption]:
+        return [
+            HomeManagerOption.model_validate(render_html_fields(opt, ("description",)))
+            for opt in r.json().get("options", [])
+        ]
+
+    return _cache.request_derived(url, parse_options, expire=_options_expire(release_value))
+
+
+def _build_index(options: list[HomeManagerOption]) -> tuple[Index, dict[str, HomeManagerOption]]:
     """Build a lunr search index from options."""
     by_title = {}
 
     def doc_gen():
         for i, opt in enumerate(options):
-            title = opt.get("title", "")
             by_title[str(i)] = opt
             yield {
                 "id": str(i),
-                "title": title,
-                "description": opt.get("description", "") or "",
+                "title": opt.title,
+                "description": opt.description,
             }
 
     idx = lunr(ref="id", fields=["title", "description"], documents=list(doc_gen()))
@@ -138,7 +156,7 @@ class HomeManagerSearch:
         for result in results[:limit]:
             opt = data.by_title.get(result["ref"])
             if opt:
-                options.append(HomeManagerOption.model_validate(opt))
+                options.append(opt)
 
         return SearchResult(items=options, total=total)
 
@@ -149,8 +167,8 @@ class HomeManagerSearch:
         data = get_release_data(release_value)
 
         for opt in data.options:
-            if opt.get("title") == name:
-                return HomeManagerOption.model_validate(opt)
+            if opt.title == name:
+                return opt
         return None
 
     @staticmethod
@@ -160,9 +178,18 @@ class HomeManagerSearch:
         data = get_release_data(release_value)
         prefix_dot = f"{prefix}."
 
-        return [
-            HomeManagerOption.model_validate(opt) for opt in data.options if opt.get("title", "").startswith(prefix_dot)
-        ]
+        return [opt for opt in data.options if opt.title.startswith(prefix_dot)]
+
+    @staticmethod
+    def list_options(release: str) -> list[HomeManagerOption]:
+        """Get every option of a release."""
+        return _get_options(HomeManagerSearch._get_release_value(release))
+
+    @staticmethod
+    def get_revision(release: str) -> str | None:
+        """Get the identity of a release's option dump, fetching it if needed."""
+        release_value = HomeManagerSearch._get_release_value(release)
+        return _cache.token(_options_url(release_value), expire=_options_expire(release_value))
 
     @staticmethod
     def list_releases() -> list[HomeManagerRelease]:
@@ -5,8 +5,6 @@ from dataclasses import dataclass
 
 from pydantic import BaseModel, Field, field_validator
 
-from .utils import html_to_text
-
 
 @dataclass
 class SearchResult[T]:
@@ -33,7 +31,7 @@ class Package(BaseModel):
     name: str = Field(alias="package_pname")
     version: str = Field(alias="package_pversion")
     description: str = Field(default="", alias="package_description")
-    homepage: str = ""
+    homepage: str = Field(default="", alias="package_homepage")
     licenses: list[str] = Field(default_factory=list, alias="package_license_set")
     position: str = Field(default="", alias="package_position")
 
@@ -68,7 +66,10 @@ class Package(BaseModel):
 
 
 class Option(BaseModel):
-    """NixOS option."""
+    """NixOS option.
+
+    The description is expected as plain text, see `search._option_source`.
+    """
 
     name: str = Field(alias="option_name")
     type: str = Field(default="", alias="option_type")
@@ -82,11 +83,6 @@ class Option(BaseModel):
     def coerce_none_to_str(cls, v):
         return v if v is not None else ""
 
-    @field_validator("description", mode="after")
-    @classmethod
-    def clean_description(cls, v):
-        return html_to_text(v) if v else ""
-
     @field_validator("declarations", mode="before")
     @classmethod
     def coerce_declarations(cls, v):
@@ -133,7 +129,10 @@ class Channel(BaseModel):
 
 
 class HomeManagerOption(BaseModel):
-    """Home Manager option."""
+    """Home Manager option.
+
+    The description is expected as plain text, see `homemanager._get_options`.
+    """
 
     title: str
     type: str = ""
@@ -142,16 +141,11 @@ class HomeManagerOption(BaseModel):
     example: str = ""
     declarations: list[dict] = Field(default_factory=list)
 
-    @field_validator("type", "default", "example", mode="before")
+    @field_validator("type", "description", "default", "example", mode="before")
     @classmethod
     def coerce_none_to_str(cls, v):
         return str(v) if v is not None else ""
 
-    @field_validator("description", mode="after")
-    @classmethod
-    def clean_description(cls, v):
-        return html_to_text(v) if v else ""
-
     def format_short(self) -> str:
         """Format for search results listing."""
         lines = [f"• {self.title}"]
@@ -233,11 +227,13 @@ class NixhubCommit(BaseModel):
     version: str
     attribute_path: str
     commit_hash: str
+    requested: str | None = None  # Constraint the version was resolved from, when not an exact version
 
     def __str__(self) -> str:
         return _lines(
             ("Package", self.name),
             ("Version", self.version),
+            ("Requested", self.requested or ""),
             ("Attribute", self.attribute_path),
             ("Commit", self.commit_hash),
         )
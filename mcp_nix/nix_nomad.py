@@ -1,17 +1,29 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """nix-nomad option search via HTML parsing."""
 
-from bs4 import BeautifulSoup
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
 from pydantic import BaseModel, Field, field_validator
 
 from .cache import get_cache
 from .models import SearchResult, _lines
-from .utils import html_to_text
 
 NIX_NOMAD_URL = "https://tristanpemble.github.io/nix-nomad/"
 
 _cache = get_cache("nix-nomad")
 
+_TOKEN_RE = re.compile(r"\w+")
+
+# Score tiers, highest match wins
+EXACT_SCORE = 1000
+PREFIX_SCORE = 100
+NAME_SCORE = 50
+DESCRIPTION_SCORE = 10
+TOKEN_SCORE = 5  # All query words appear, but not as one substring
+WHOLE_WORD_BONUS = 5  # Substring matches that are whole words rank first within their tier
+
 
 class NixNomadOption(BaseModel):
     """nix-nomad configuration option."""
@@ -27,11 +39,6 @@ class NixNomadOption(BaseModel):
     def coerce_none_to_str(cls, v):
         return str(v) if v is not None else ""
 
-    @field_validator("description", "default", "example", mode="after")
-    @classmethod
-    def clean_html(cls, v):
-        return html_to_text(v) if v else ""
-
     def format_short(self) -> str:
         """Format for search results listing."""
         lines = [f"• {self.name}"]
@@ -55,84 +62,304 @@ class NixNomadOption(BaseModel):
         )
 
 
+# Elements without an end tag
+_VOID_TAGS = frozenset(
+    {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+)
+_LABELS = ("Type:", "Default:", "Example:", "Declared by:")
+
+
+@dataclass
+class _Paragraph:
+    """Text of a <p> directly under a <dd>, split up the way fields are taken from it."""
+
+    text: list[str] = field(default_factory=list)
+    label: list[str] | None = None  # Text of its first <em>, if any
+    rest: list[str] = field(default_factory=list)  # Text outside its first <em>
+    code: list[str] | None = None  # Text of its first <code> outside the first <em>, if any
+
+
+def _option_fields(children: list[_Paragraph | str]) -> dict[str, str]:
+    """Get an option's fields from the <p> and <pre> children of its <dd>, <pre>s given as text."""
+    fields = {"type": "", "description": "", "default": "", "example": ""}
+    paragraphs = [(pos, child) for pos, child in enumerate(children) if isinstance(child, _Paragraph)]
+    for i, (pos, p) in enumerate(paragraphs):
+        text = "".join(p.text)
+        if p.label is not None:
+            label = "".join(p.label)
+            code = "".join(p.code) if p.code is not None else "".join(p.rest)
+            if label == "Type:":
+                fields["type"] = "".join(p.rest)
+            elif label == "Default:":
+                fields["default"] = code
+            elif label == "Example:":
+                # Example may be in a pre block following this p
+                pre = next((child for child in children[pos + 1 :] if isinstance(child, str)), None)
+                fields["example"] = pre if pre is not None else code
+        elif i == 0 and not text.startswith(_LABELS):
+            # First paragraph without em label is the description
+            fields["description"] = text
+    return fields
+
+
+class _OptionListParser(HTMLParser):
+    """Streaming extractor of the options listed in DocBook variablelists.
+
+    A <dt> holding an "opt-" anchor and a <code class="option"> names an option,
+    which is described by the next <dd> among its siblings. Text is collected
+    per field as BeautifulSoup's get_text(strip=True) would.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.options: dict[str, NixNomadOption] = {}
+        self._pending: list[str] = []
+        self._stack: list[str] = []  # Open elements, an element's depth is its position here
+        # <dt> being read
+        self._dt_depth: int | None = None
+        self._dt_anchor = False
+        self._dt_name: list[str] | None = None
+        self._dt_code_depth: int | None = None
+        # Options named by <dt>s waiting for their <dd>, and the depth of those <dt>s
+        self._terms: list[str] = []
+        self._terms_depth: int | None = None
+        # <dd> being read, with its <p> and <pre> children so far
+        self._dd_depth: int | None = None
+        self._dd_children: list[_Paragraph | str] = []
+        self._p: _Paragraph | None = None
+        self._em_depth: int | None = None
+        self._code_depth: int | None = None
+        self._pre: list[str] | None = None
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        data = "".join(self._pending).strip()
+        self._pending = []
+        if not data:
+            return
+        if self._dt_code_depth is not None and self._dt_name is not None:
+            self._dt_name.append(data)
+        if self._p is not None:
+            self._p.text.append(data)
+            if self._em_depth is not None and self._p.label is not None:
+                self._p.label.append(data)
+            else:
+                self._p.rest.append(data)
+                if self._code_depth is not None and self._p.code is not None:
+                    self._p.code.append(data)
+        if self._pre is not None:
+            self._pre.append(data)
+
+    def _open(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self._flush()
+        depth = len(self._stack)
+        self._stack.append(tag)
+
+        if tag == "dt" and self._dt_depth is None:
+            self._dt_depth, self._dt_anchor, self._dt_name = depth, False, None
+        elif self._dt_depth is not None:
+            attributes = dict(attrs)
+            if tag == "a" and (attributes.get("id") or "").startswith("opt-"):
+                self._dt_anchor = True
+            elif tag == "code" and self._dt_name is None and "option" in (attributes.get("class") or "").split():
+                self._dt_name, self._dt_code_depth = [], depth
+
+        if tag == "dd" and self._dd_depth is None and self._terms and self._terms_depth == depth:
+            self._dd_depth, self._dd_children = depth, []
+        elif self._dd_depth is not None and depth == self._dd_depth + 1:
+            if tag == "p":
+                self._p = _Paragraph()
+            elif tag == "pre":
+                self._pre = []
+        elif self._p is not None:
+            if tag == "em" and self._p.label is None:
+                self._p.label, self._em_depth = [], depth
+            elif tag == "code" and self._p.code is None and self._em_depth is None:
+                self._p.code, self._code_depth = [], depth
+
+    def _close(self, depth: int) -> None:
+        """Close the element at depth, after its descendants."""
+        self._flush()
+        del self._stack[depth:]
+
+        if depth == self._dt_code_depth:
+            self._dt_code_depth = None
+        if depth == self._dt_depth:
+            name = "".join(self._dt_name) if self._dt_name is not None else ""
+            if self._dt_anchor and name:
+                if self._terms_depth != depth:
+                    self._terms = []
+                self._terms.append(name)
+                self._terms_depth = depth
+            self._dt_depth = None
+
+        if depth == self._em_depth:
+            self._em_depth = None
+        if depth == self._code_depth:
+            self._code_depth = None
+        if self._dd_depth is not None and depth == self._dd_depth + 1:
+            if self._p is not None:
+                self._dd_children.append(self._p)
+                self._p = None
+            if self._pre is not None:
+                self._dd_children.append("".join(self._pre))
+                self._pre = None
+        if depth == self._dd_depth:
+            fields = _option_fields(self._dd_children)
+            for name in self._terms:
+                self.options[name] = NixNomadOption(name=name, **fields)
+            self._terms, self._terms_depth, self._dd_depth = [], None, None
+        if self._terms_depth is not None and depth < self._terms_depth:
+            # The <dt>s' parent ended without a <dd>
+            self._terms, self._terms_depth = [], None
+
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs)
+        if tag in _VOID_TAGS:
+            self._close(len(self._stack) - 1)
+
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs)
+        self._close(len(self._stack) - 1)
+
+    def handle_endtag(self, tag):
+        # Like BeautifulSoup, close the most recent matching element and ignore stray end tags
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth] == tag:
+                while len(self._stack) > depth:
+                    self._close(len(self._stack) - 1)
+                return
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            self._pending.append(data[6:])
+            self._flush()
+
+    def close(self):
+        super().close()
+        while self._stack:
+            self._close(len(self._stack) - 1)
+        self._flush()
+
+
 def _parse_options(html: str) -> dict[str, NixNomadOption]:
-    """Parse options from the DocBook HTML documentation."""
-    soup = BeautifulSoup(html, "html.parser")
-    options: dict[str, NixNomadOption] = {}
-
-    # Find all option entries in the variablelist
-    # Structure: <dl class="variablelist"><dt>...<a id="opt-{name}">...
-    for dt in soup.find_all("dt"):
-        # Get option name from the anchor id or code element
-        anchor = dt.find("a", id=lambda x: x and x.startswith("opt-"))
-        if not anchor:
-            continue
-
-        code = dt.find("code", class_="option")
-        if not code:
-            continue
-
-        name = code.get_text(strip=True)
-        if not name:
-            continue
-
-        # Get the corresponding dd element
-        dd = dt.find_next_sibling("dd")
-        if not dd:
-            continue
-
-        # Parse fields from dd
-        option_type = ""
-        description = ""
-        default = ""
-        example = ""
-
-        # Process paragraphs
-        paragraphs = dd.find_all("p", recursive=False)
-        for i, p in enumerate(paragraphs):
-            text = p.get_text(strip=True)
-            em = p.find("em")
-
-            if em:
-                em_text = em.get_text(strip=True)
-                if em_text == "Type:":
-                    # Type is the rest of the paragraph
-                    em.decompose()
-                    option_type = p.get_text(strip=True)
-                elif em_text == "Default:":
-                    # Default may be in a code block or literal
-                    em.decompose()
-                    code_block = p.find("code")
-                    default = code_block.get_text(strip=True) if code_block else p.get_text(strip=True)
-                elif em_text == "Example:":
-                    # Example may be in a pre block following this p
-                    em.decompose()
-                    pre = p.find_next_sibling("pre")
-                    if pre:
-                        example = pre.get_text(strip=True)
-                    else:
-                        code_block = p.find("code")
-                        example = code_block.get_text(strip=True) if code_block else p.get_text(strip=True)
-                elif em_text == "Declared by:":
-                    pass  # Skip declaration info
-            elif i == 0 and not text.startswith(("Type:", "Default:", "Example:", "Declared by:")):
-                # First paragraph without em label is the description
-                description = text
-
-        options[name] = NixNomadOption(
-            name=name,
-            type=option_type,
-            description=description,
-            default=default,
-            example=example,
-        )
+    """Parse options from the DocBook HTML documentation.
+
+    Fields are extracted as plain text here, so options never hold HTML. The page is
+    read in one streaming pass instead of being built into a tree.
+    """
+    parser = _OptionListParser()
+    parser.feed(html)
+    parser.close()
+    return parser.options
 
-    return options
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass
+class OptionsIndex:
+    """Options with lowercased fields and word and trigram indexes over them.
+
+    Substring queries of three characters or more only check the options holding all
+    of their trigrams, so a query costs about as much as its matches.
+    """
+
+    options: dict[str, NixNomadOption]
+    entries: list[NixNomadOption] = field(default_factory=list)
+    names: list[str] = field(default_factory=list)  # Lowercased
+    descriptions: list[str] = field(default_factory=list)  # Lowercased
+    words: dict[str, set[int]] = field(default_factory=dict)  # word -> ids of options with it in name or description
+    name_words: list[frozenset[str]] = field(default_factory=list)
+    description_words: list[frozenset[str]] = field(default_factory=list)
+    trigrams: dict[str, set[int]] = field(default_factory=dict)  # trigram -> ids of options with it in either field
+
+    @classmethod
+    def build(cls, options: dict[str, NixNomadOption]) -> "OptionsIndex":
+        index = cls(options=options)
+        for i, opt in enumerate(options.values()):
+            name = opt.name.lower()
+            description = opt.description.lower()
+            index.entries.append(opt)
+            index.names.append(name)
+            index.descriptions.append(description)
+            index.name_words.append(frozenset(_tokens(name)))
+            index.description_words.append(frozenset(_tokens(description)))
+            for word in index.name_words[i] | index.description_words[i]:
+                index.words.setdefault(word, set()).add(i)
+            for trigram in _trigrams(name) | _trigrams(description):
+                index.trigrams.setdefault(trigram, set()).add(i)
+        return index
+
+    def _candidates(self, query: str, query_words: list[str]) -> set[int] | range:
+        """Get the ids of options that may match, as a substring or by all words."""
+        trigrams = _trigrams(query)
+        if not trigrams:
+            return range(len(self.entries))  # Too short to narrow down
+        substring = set.intersection(*(self.trigrams.get(t, set()) for t in trigrams))
+        if not query_words:
+            return substring
+        all_words = set.intersection(*(self.words.get(w, set()) for w in query_words))
+        return substring | all_words
+
+    def _score(self, i: int, query: str, query_words: list[str]) -> int:
+        name = self.names[i]
+        if query == name:
+            return EXACT_SCORE
+        if name.startswith(query):
+            return PREFIX_SCORE
+        whole_words = bool(query_words) and all(w in self.name_words[i] for w in query_words)
+        if query in name:
+            return NAME_SCORE + (WHOLE_WORD_BONUS if whole_words else 0)
+        if query in self.descriptions[i]:
+            in_description = all(w in self.description_words[i] for w in query_words)
+            return DESCRIPTION_SCORE + (WHOLE_WORD_BONUS if query_words and in_description else 0)
+        if query_words and all(w in self.name_words[i] or w in self.description_words[i] for w in query_words):
+            return TOKEN_SCORE
+        return 0
+
+    def search(self, query: str, limit: int) -> SearchResult[NixNomadOption]:
+        query = query.lower()
+        query_words = _tokens(query)
+
+        scored: list[tuple[int, str, NixNomadOption]] = []
+        for i in self._candidates(query, query_words):
+            score = self._score(i, query, query_words)
+            if score > 0:
+                scored.append((score, self.entries[i].name, self.entries[i]))
+
+        # Sort by score descending
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return SearchResult(items=[opt for _, _, opt in scored[:limit]], total=len(scored))
+
+
+def _get_index() -> OptionsIndex:
+    """Get the options and their search index, loading from cache or fetching as needed."""
+    return _cache.request_derived(NIX_NOMAD_URL, lambda r: OptionsIndex.build(_parse_options(r.text)))
 
 
 def _get_options() -> dict[str, NixNomadOption]:
     """Get all options, loading from cache or fetching as needed."""
-    return _cache.request(NIX_NOMAD_URL, lambda r: _parse_options(r.text))
+    return _get_index().options
 
 
 class NixNomadSearch:
@@ -141,37 +368,7 @@ class NixNomadSearch:
     @staticmethod
     def search_options(query: str, limit: int) -> SearchResult[NixNomadOption]:
         """Search for nix-nomad options by name or description."""
-        options = _get_options()
-        query_lower = query.lower()
-
-        # Score options by relevance
-        scored: list[tuple[int, NixNomadOption]] = []
-        for opt in options.values():
-            score = 0
-            name_lower = opt.name.lower()
-            desc_lower = opt.description.lower()
-
-            # Exact name match
-            if query_lower == name_lower:
-                score = 1000
-            # Name starts with query
-            elif name_lower.startswith(query_lower):
-                score = 100
-            # Query in name
-            elif query_lower in name_lower:
-                score = 50
-            # Query in description
-            elif query_lower in desc_lower:
-                score = 10
-
-            if score > 0:
-                scored.append((score, opt))
-
-        # Sort by score descending
-        scored.sort(key=lambda x: (-x[0], x[1].name))
-
-        results = [opt for _, opt in scored[:limit]]
-        return SearchResult(items=results, total=len(scored))
+        return _get_index().search(query, limit)
 
     @staticmethod
     def get_option(name: str) -> NixNomadOption | None:
@@ -193,3 +390,13 @@ class NixNomadSearch:
         # Sort by name
         children.sort(key=lambda x: x.name)
         return children
+
+    @staticmethod
+    def list_options() -> list[NixNomadOption]:
+        """Get every option."""
+        return list(_get_options().values())
+
+    @staticmethod
+    def get_revision() -> str | None:
+        """Get the identity of the options page, fetching it if needed."""
+        return _cache.token(NIX_NOMAD_URL)
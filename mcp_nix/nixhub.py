@@ -1,14 +1,126 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Nixhub.io API integration for package version lookup."""
 
+import bisect
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
 from .cache import get_cache
-from .models import NixhubCommit, NixhubRelease
+from .models import NixhubCommit, NixhubPlatform, NixhubRelease
 from .search import APIError
 
 NIXHUB_API_URL = "https://www.nixhub.io/packages"
 
+BATCH_WORKERS = 8  # Packages fetched concurrently by batch lookups
+
 _cache = get_cache("nixhub")
 
+_PART_RE = re.compile(r"\d+|[a-z]+")
+_OPERATORS = (">=", "<=", ">", "<", "^", "~", "=")
+_WILDCARD_RE = re.compile(r"(\.?[x*])+$", re.IGNORECASE)
+_SPACED_OPERATOR_RE = re.compile(r"(>=|<=|[<>^~=])\s+")
+_TERM_SEP_RE = re.compile(r"[\s,]+")
+
+# Version key parts: letters sort below the end of a version, which sorts below numbers,
+# so "1.0.0rc1" < "1.0.0" < "1.0.0.1"
+_LETTERS, _END, _NUMBER, _AFTER_ALL = 0, 1, 2, 3
+
+type VersionKey = tuple[tuple[int, int | str], ...]
+
+
+def version_key(version: str) -> VersionKey:
+    """Get a sort key for a version string, comparing numeric parts as numbers."""
+    parts = tuple((_NUMBER, int(p)) if p.isdigit() else (_LETTERS, p) for p in _PART_RE.findall(version.lower()))
+    return (*parts, (_END, 0))
+
+
+def _prefix_key(version: str) -> VersionKey:
+    """Get the key parts of a version used as a prefix, without the end marker."""
+    return version_key(version)[:-1]
+
+
+@dataclass
+class _Range:
+    """Versions between two keys, as [lower, upper) with the inclusiveness given."""
+
+    lower: VersionKey = ()
+    upper: VersionKey = ((_AFTER_ALL, 0),)
+    lower_inclusive: bool = True
+    upper_inclusive: bool = False
+
+    def intersect(self, other: "_Range") -> "_Range":
+        result = _Range(self.lower, self.upper, self.lower_inclusive, self.upper_inclusive)
+        if other.lower > result.lower or (other.lower == result.lower and not other.lower_inclusive):
+            result.lower, result.lower_inclusive = other.lower, other.lower_inclusive
+        if other.upper < result.upper or (other.upper == result.upper and not other.upper_inclusive):
+            result.upper, result.upper_inclusive = other.upper, other.upper_inclusive
+        return result
+
+
+def _numbers(parts: VersionKey) -> list[int]:
+    return [int(value) for kind, value in parts if kind == _NUMBER]
+
+
+def _bump(parts: VersionKey, position: int) -> VersionKey:
+    """Get the key of the next release at a position, e.g. 1.2.3 -> 2 at 0, 1.3 at 1."""
+    numbers = (_numbers(parts) + [0] * (position + 1))[: position + 1]
+    numbers[position] += 1
+    return tuple((_NUMBER, n) for n in numbers)
+
+
+def _terms(spec: str) -> list[str]:
+    """Split a constraint into terms, keeping operators with their version as in ">= 18"."""
+    return [term for term in _TERM_SEP_RE.split(_SPACED_OPERATOR_RE.sub(r"\1", spec.strip())) if term]
+
+
+def _split_term(term: str) -> tuple[str, str]:
+    """Split a constraint term into its operator (empty for a bare version) and version."""
+    operator = next((op for op in _OPERATORS if term.startswith(op)), "")
+    return operator, _WILDCARD_RE.sub("", term[len(operator) :].strip().removeprefix("v"))
+
+
+def _term_range(term: str) -> _Range:
+    """Get the versions matched by one constraint term, like "^1.2", ">=3.11" or "20.x"."""
+    operator, version = _split_term(term)
+    parts = _prefix_key(version)
+    if not parts:
+        raise InvalidConstraintError(term)
+    key = version_key(version)
+    # Versions a bare version is a prefix of sort below this
+    after_prefix = (*parts, (_AFTER_ALL, 0))
+    if operator == ">=":
+        return _Range(lower=key)
+    if operator == ">":
+        return _Range(lower=after_prefix)
+    if operator == "<=":
+        return _Range(upper=after_prefix)
+    if operator == "<":
+        return _Range(upper=key)
+    if operator == "=":
+        return _Range(lower=key, upper=key, upper_inclusive=True)
+    if operator == "^":
+        # Same leftmost non-zero part, like npm
+        numbers = _numbers(parts)
+        position = next((i for i, n in enumerate(numbers) if n != 0), max(len(numbers) - 1, 0))
+        return _Range(lower=key, upper=_bump(parts, position))
+    if operator == "~":
+        # Patch updates, or minor updates when only a major version is given
+        return _Range(lower=key, upper=_bump(parts, 1 if len(_numbers(parts)) > 1 else 0))
+    # A bare version matches the versions it is a prefix of, part by part
+    return _Range(lower=parts, upper=after_prefix)
+
+
+def parse_constraint(spec: str) -> _Range:
+    """Parse a version constraint, terms separated by spaces or commas all having to match.
+
+    Raises InvalidConstraintError for terms without a version, like "||".
+    """
+    result = _Range()
+    for term in _terms(spec):
+        result = result.intersect(_term_range(term))
+    return result
+
 
 class PackageNotFoundError(APIError):
     """Raised when package is not found on nixhub."""
@@ -18,6 +130,17 @@ class PackageNotFoundError(APIError):
         super().__init__(f"Package '{name}' not found")
 
 
+class InvalidConstraintError(APIError):
+    """Raised when a version constraint has a term without a version."""
+
+    def __init__(self, term: str):
+        self.term = term
+        super().__init__(
+            f"Invalid version constraint term '{term}': expected a version like '20', '^1.2' or '>=3.11'"
+            " ('||' alternatives aren't supported)"
+        )
+
+
 class VersionNotFoundError(APIError):
     """Raised when version is not found for a package."""
 
@@ -28,54 +151,203 @@ class VersionNotFoundError(APIError):
         super().__init__(f"Version '{version}' not found for '{name}'")
 
 
-def fetch_package(name: str) -> dict:
-    """Fetch package data from Nixhub API or cache."""
-    url = f"{NIXHUB_API_URL}/{name}?_data=routes/_nixhub.packages.$pkg._index"
+@dataclass
+class VersionMap:
+    """A package's releases, validated once, with the platforms of each version.
+
+    Built when the nixhub payload is fetched and cached along with it, so lookups
+    are dictionary reads and listing versions doesn't validate releases again.
+    """
+
+    releases: list[NixhubRelease]
+    platforms: dict[str, list[NixhubPlatform]] = field(default_factory=dict)  # version -> commit/attr per platform
+    versions: list[str] = field(default_factory=list)  # All versions, in nixhub's order
+    # Versions with platforms, sorted by version_key, and their keys for bisecting
+    sorted_versions: list[str] = field(default_factory=list)
+    sorted_keys: list[VersionKey] = field(default_factory=list)
 
-    def parse_package(r) -> dict:
-        data = r.json()
-        if not data or "releases" not in data:
-            raise PackageNotFoundError(name)
-        return data
+    @classmethod
+    def build(cls, data: dict) -> "VersionMap":
+        version_map = cls(releases=[NixhubRelease.model_validate(r) for r in data.get("releases", [])])
+        for release in version_map.releases:
+            if release.version:
+                version_map.versions.append(release.version)
+            # The first release of a version with platforms wins, like nixhub's listing
+            if release.platforms and release.version not in version_map.platforms:
+                version_map.platforms[release.version] = release.platforms
+        version_map.sorted_versions = sorted(version_map.platforms, key=version_key)
+        version_map.sorted_keys = [version_key(v) for v in version_map.sorted_versions]
+        return version_map
 
+    def resolve(self, spec: str) -> str | None:
+        """Get the version matching a spec: the exact version, else the highest one satisfying it as a constraint."""
+        matching = self.matching(spec)
+        return matching[0] if matching else None
+
+    def matching(self, spec: str) -> list[str]:
+        """Get the versions matching a spec, highest first. An exact version only matches itself."""
+        if spec in self.platforms:
+            return [spec]
+        bounds = parse_constraint(spec)
+        if bounds.lower_inclusive:
+            start = bisect.bisect_left(self.sorted_keys, bounds.lower)
+        else:
+            start = bisect.bisect_right(self.sorted_keys, bounds.lower)
+        if bounds.upper_inclusive:
+            end = bisect.bisect_right(self.sorted_keys, bounds.upper)
+        else:
+            end = bisect.bisect_left(self.sorted_keys, bounds.upper)
+        return self.sorted_versions[start:end][::-1]
+
+    def commits(self, spec: str) -> dict[str, tuple[str, NixhubPlatform]]:
+        """Get the nixpkgs commits providing a version matching a spec, mapped to (version, platform)."""
+        commits: dict[str, tuple[str, NixhubPlatform]] = {}
+        for version in self.matching(spec):
+            for platform in self.platforms[version]:
+                commits.setdefault(platform.commit_hash, (version, platform))
+        return commits
+
+    def closest(self, spec: str) -> list[str]:
+        """Get the versions with platforms, closest to the version in a spec first."""
+        terms = _terms(spec)
+        _, version = _split_term(terms[0] if terms else "")
+        target = _prefix_key(version)
+
+        def closeness(pos: int) -> tuple[int, int, int]:
+            key = self.sorted_keys[pos]
+            common = 0
+            while common < min(len(key), len(target)) and key[common] == target[common]:
+                common += 1
+            distance = 0
+            if common < min(len(key), len(target)):
+                (kind, value), (target_kind, target_value) = key[common], target[common]
+                numbers = kind == target_kind == _NUMBER
+                distance = abs(int(value) - int(target_value)) if numbers else 1 << 30
+            # More leading parts in common, then nearer at the first differing part, then newer
+            return (-common, distance, -pos)
+
+        return [self.sorted_versions[pos] for pos in sorted(range(len(self.sorted_versions)), key=closeness)]
+
+
+def _package_url(name: str) -> str:
+    return f"{NIXHUB_API_URL}/{name}?_data=routes/_nixhub.packages.$pkg._index"
+
+
+def _parse_package(name: str, r) -> dict:
+    data = r.json()
+    if not data or "releases" not in data:
+        raise PackageNotFoundError(name)
+    return data
+
+
+def get_version_map(name: str) -> VersionMap:
+    """Get the version map of a package, built once per fetched payload."""
     try:
-        return _cache.request(url, parse_package)
+        return _cache.request_derived(_package_url(name), lambda r: VersionMap.build(_parse_package(name, r)))
     except APIError as e:
         if "404" in str(e):
             raise PackageNotFoundError(name) from e
         raise
 
 
+@dataclass
+class PinResult:
+    """Commits for several packages, and a nixpkgs commit providing all of them if there is one."""
+
+    commits: dict[str, NixhubCommit]
+    errors: dict[str, APIError]
+    common: dict[str, NixhubCommit] = field(default_factory=dict)  # Empty if no single commit has every version
+
+    @property
+    def common_commit(self) -> str | None:
+        return next(iter(self.common.values())).commit_hash if self.common else None
+
+
+def _try_version_map(name: str) -> VersionMap | APIError:
+    try:
+        return get_version_map(name)
+    except APIError as e:
+        return e
+
+
+def _common_commit(packages: dict[str, str], maps: dict[str, VersionMap]) -> dict[str, NixhubCommit]:
+    """Find a nixpkgs commit with a matching version of every package, preferring the first package's newest."""
+    candidates = {name: maps[name].commits(spec) for name, spec in packages.items()}
+    first, *others = candidates.values()
+    for commit_hash in first:
+        if all(commit_hash in commits for commits in others):
+            return {
+                name: NixhubCommit(
+                    name=name,
+                    version=candidates[name][commit_hash][0],
+                    attribute_path=candidates[name][commit_hash][1].attribute_path,
+                    commit_hash=commit_hash,
+                    requested=spec if candidates[name][commit_hash][0] != spec else None,
+                )
+                for name, spec in packages.items()
+            }
+    return {}
+
+
+def _resolve_commit(name: str, version: str, version_map: VersionMap) -> NixhubCommit:
+    """Get the commit of the version of a package matching a version or constraint."""
+    resolved = version_map.resolve(version)
+    if resolved is None:
+        # Version not found - provide available versions, nearest first
+        raise VersionNotFoundError(name, version, version_map.closest(version))
+
+    # Return the first platform's commit info
+    platform = version_map.platforms[resolved][0]
+    return NixhubCommit(
+        name=name,
+        version=resolved,
+        attribute_path=platform.attribute_path,
+        commit_hash=platform.commit_hash,
+        requested=version if resolved != version else None,
+    )
+
+
 class NixhubSearch:
     """Nixhub API search functionality."""
 
     @staticmethod
     def get_versions(name: str) -> list[NixhubRelease]:
         """Get all available versions for a package."""
-        data = fetch_package(name)
-        releases = data.get("releases", [])
-        return [NixhubRelease.model_validate(r) for r in releases]
+        return list(get_version_map(name).releases)
 
     @staticmethod
     def get_commit(name: str, version: str) -> NixhubCommit:
-        """Get the nixpkgs commit hash for a specific package version."""
-        data = fetch_package(name)
-        releases = data.get("releases", [])
-
-        # Find the matching version
-        for release in releases:
-            if release.get("version") == version:
-                platforms = release.get("platforms", [])
-                if platforms:
-                    # Return the first platform's commit info
-                    platform = platforms[0]
-                    return NixhubCommit(
-                        name=name,
-                        version=version,
-                        attribute_path=platform.get("attribute_path", ""),
-                        commit_hash=platform.get("commit_hash", ""),
-                    )
-
-        # Version not found - provide available versions
-        available = [r.get("version", "") for r in releases if r.get("version")]
-        raise VersionNotFoundError(name, version, available)
+        """Get the nixpkgs commit hash for a package version.
+
+        The version is an exact version, or a constraint resolved to the highest
+        matching version: a prefix ("20", "3.12.x"), "^1.2", "~1.2.3", or comparisons
+        (">=18 <21").
+        """
+        return _resolve_commit(name, version, get_version_map(name))
+
+    @staticmethod
+    def get_commits(packages: dict[str, str]) -> PinResult:
+        """Get the nixpkgs commit of several package versions or constraints at once.
+
+        Packages are fetched concurrently. Besides each package's own commit, looks for
+        a single nixpkgs commit that has a matching version of all of them when there
+        are several.
+        """
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="mcp-nix-nixhub") as executor:
+            fetched = dict(zip(packages, executor.map(_try_version_map, packages), strict=True))
+
+        result = PinResult(commits={}, errors={})
+        maps: dict[str, VersionMap] = {}
+        for name, version_map in fetched.items():
+            if isinstance(version_map, APIError):
+                result.errors[name] = version_map
+                continue
+            maps[name] = version_map
+            try:
+                result.commits[name] = _resolve_commit(name, packages[name], version_map)
+            except APIError as e:
+                result.errors[name] = e
+
+        if len(packages) > 1 and not result.errors:
+            result.common = _common_commit(packages, maps)
+        return result
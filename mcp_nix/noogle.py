@@ -4,6 +4,7 @@
 import gzip
 import json
 import re
+import threading
 from collections.abc import Callable
 from typing import Any
 
@@ -11,9 +12,12 @@ import requests
 from bs4 import BeautifulSoup
 from wasmtime import Engine, Func, Instance, Linker, Memory, Module, Store
 
+from .cache import DEFAULT_EXPIRE, get_cache
 from .models import FunctionInput, NoogleExample, NoogleFunction, SearchResult
 from .search import APIError
 
+_cache = get_cache("noogle")
+
 # =============================================================================
 # Exceptions
 # =============================================================================
@@ -37,14 +41,16 @@ class FunctionNotFoundError(NoogleError):
 
 # In-memory cache for PagefindSearch instance (singleton)
 _pagefind_instance: "PagefindSearch | None" = None
+_pagefind_lock = threading.Lock()
 
 
 def _get_pagefind() -> "PagefindSearch":
     """Get or create the PagefindSearch singleton."""
     global _pagefind_instance
-    if _pagefind_instance is None:
-        _pagefind_instance = PagefindSearch()
-    return _pagefind_instance
+    with _pagefind_lock:
+        if _pagefind_instance is None:
+            _pagefind_instance = PagefindSearch()
+        return _pagefind_instance
 
 
 # =============================================================================
@@ -59,7 +65,7 @@ class PagefindSearch:
     PAGEFIND_PATH = "/pagefind"
 
     def __init__(self):
-        self.session = requests.Session()
+        self._init_lock = threading.Lock()
         self._store: Store | None = None
         self._instance: Instance | None = None
         self._memory: Memory | None = None
@@ -96,11 +102,11 @@ class PagefindSearch:
         return export
 
     def _fetch(self, path: str) -> bytes:
-        """Fetch a resource from Noogle."""
+        """Fetch a resource from Noogle, using cache if available."""
         url = f"{self.BASE_URL}{self.PAGEFIND_PATH}/{path}"
-        resp = self.session.get(url, timeout=30)
-        resp.raise_for_status()
-        return resp.content
+        # Index files are content-addressed, cache forever
+        hashed = path.endswith((".pf_meta", ".pf_index", ".pf_fragment"))
+        return _cache.request(url, lambda r: r.content, expire=None if hashed else DEFAULT_EXPIRE, timeout=30)
 
     def _decompress(self, data: bytes) -> bytes:
         """Decompress Pagefind data (gzip with signature)."""
@@ -266,10 +272,15 @@ class PagefindSearch:
         fragment_bytes = self._decompress(fragment_compressed)
         return json.loads(fragment_bytes.decode("utf-8"))
 
+    def ensure_initialized(self) -> None:
+        """Load the WASM runtime and index metadata, once."""
+        with self._init_lock:
+            if self._instance is None:
+                self._init_wasm()
+
     def search(self, query: str, limit: int = 20) -> tuple[list[NoogleFunction], int]:
         """Search for functions. Returns (results, total_count)."""
-        if self._instance is None:
-            self._init_wasm()
+        self.ensure_initialized()
 
         # Normalize query
         normalized = query.lower().strip()
@@ -549,18 +560,14 @@ def _fetch_noogle_function(function_path: str) -> NoogleFunction:
     url = f"https://noogle.dev{path}"
 
     try:
-        response = requests.get(url, timeout=30, allow_redirects=True)
-        if response.status_code == 404:
-            raise FunctionNotFoundError(function_path)
-        response.raise_for_status()
-    except requests.Timeout as e:
-        raise NoogleError("Connection timed out fetching function from Noogle") from e
-    except requests.HTTPError as e:
-        if e.response is not None and e.response.status_code == 404:
+        html = _cache.request(url, lambda r: r.text, timeout=30)
+    except APIError as e:
+        cause = e.__cause__
+        if isinstance(cause, requests.HTTPError) and cause.response is not None and cause.response.status_code == 404:
             raise FunctionNotFoundError(function_path) from e
         raise NoogleError(f"Failed to fetch function from Noogle: {e}") from e
 
-    chunks = _extract_next_data(response.text)
+    chunks = _extract_next_data(html)
     return _parse_noogle_data(chunks)
 
 
@@ -3,14 +3,16 @@
 
 from dataclasses import dataclass, field
 
+import requests
 from pydantic import BaseModel, Field, field_validator
 
 import pyixx
 
+from . import snapshot
 from .cache import get_cache
 from .models import SearchResult, _lines
 from .search import APIError, InvalidLimitError
-from .utils import html_to_text
+from .utils import render_html_fields
 
 # Search instances - base URLs for index/meta files
 INSTANCES = {
@@ -72,6 +74,9 @@ PROJECTS = {
 
 _cache = get_cache("nuschtos")
 
+# Option fields that hold HTML, rendered to text when a chunk is loaded
+_HTML_FIELDS = ("description", "default", "example")
+
 # In-memory cache for loaded indices (pyixx.Index can't be serialized)
 _index_cache: dict[str, "IndexData"] = {}
 
@@ -104,7 +109,10 @@ def _get_scope_id_for_project(project: str, index_data: "IndexData") -> int | No
 
 
 class NuschtoOption(BaseModel):
-    """NüschtOS-style option (nixvim, nix-darwin, etc.)."""
+    """NüschtOS-style option (nixvim, nix-darwin, etc.).
+
+    Text fields are expected as plain text, see `_get_chunk`.
+    """
 
     name: str
     type: str = ""
@@ -114,16 +122,11 @@ class NuschtoOption(BaseModel):
     declarations: list[str] = Field(default_factory=list)
     read_only: bool = False
 
-    @field_validator("type", "default", "example", mode="before")
+    @field_validator("type", "description", "default", "example", mode="before")
     @classmethod
     def coerce_none_to_str(cls, v):
         return str(v) if v is not None else ""
 
-    @field_validator("description", "default", "example", mode="after")
-    @classmethod
-    def clean_html(cls, v):
-        return html_to_text(v) if v else ""
-
     def format_short(self) -> str:
         """Format for search results listing."""
         lines = [f"• {self.name}"]
@@ -156,7 +159,7 @@ class IndexData:
 
     index: pyixx.Index
     meta: pyixx.IndexMeta
-    chunks: dict[int, list[dict]] = field(default_factory=dict)
+    chunks: dict[int, list[NuschtoOption]] = field(default_factory=dict)
 
 
 def _get_index_bytes(instance: str) -> bytes:
@@ -183,8 +186,12 @@ def _get_index(instance: str) -> IndexData:
     return index_data
 
 
-def _get_chunk(instance: str, chunk: int, index_data: IndexData) -> list[dict]:
-    """Get a metadata chunk, using cache if available."""
+def _get_chunk(instance: str, chunk: int, index_data: IndexData) -> list[NuschtoOption]:
+    """Get a metadata chunk, using cache if available.
+
+    Options are validated and their HTML fields rendered to text once per chunk, so
+    queries hand out these models instead of validating every hit.
+    """
     # Check in-memory cache
     if chunk in index_data.chunks:
         return index_data.chunks[chunk]
@@ -195,15 +202,15 @@ def _get_chunk(instance: str, chunk: int, index_data: IndexData) -> list[dict]:
     url = f"{INSTANCES[instance]}/meta/{chunk}.json"
 
     def use(r):
-        data = r.json()
-        index_data.chunks[chunk] = data
-        return data
+        return [NuschtoOption.model_validate(render_html_fields(opt, _HTML_FIELDS)) for opt in r.json()]
 
     # Chunks never change, cache forever
-    return _cache.request(url, use, expire=None)
+    data = _cache.request(url, use, expire=None)
+    index_data.chunks[chunk] = data
+    return data
 
 
-def _get_option_by_idx(instance: str, idx: int, index_data: IndexData) -> dict | None:
+def _get_option_by_idx(instance: str, idx: int, index_data: IndexData) -> NuschtoOption | None:
     """Get option data by index."""
     chunk, pos = index_data.index.get_chunk_for_idx(idx)
     chunk_data = _get_chunk(instance, chunk, index_data)
@@ -254,9 +261,9 @@ class NuschtosSearch:
 
         options = []
         for result in results:
-            opt_data = _get_option_by_idx(instance, result.idx, index_data)
-            if opt_data:
-                options.append(NuschtoOption.model_validate(opt_data))
+            opt = _get_option_by_idx(instance, result.idx, index_data)
+            if opt:
+                options.append(opt)
 
         return SearchResult(items=options, total=len(results))
 
@@ -272,10 +279,7 @@ class NuschtosSearch:
         if idx is None:
             return None
 
-        opt_data = _get_option_by_idx(instance, idx, index_data)
-        if opt_data:
-            return NuschtoOption.model_validate(opt_data)
-        return None
+        return _get_option_by_idx(instance, idx, index_data)
 
     @staticmethod
     def get_option_children(prefix: str, project: str) -> list[NuschtoOption]:
@@ -289,12 +293,45 @@ class NuschtosSearch:
         prefix_dot = f"{prefix}."
         for result in results:
             if result.name.startswith(prefix_dot):
-                opt_data = _get_option_by_idx(instance, result.idx, index_data)
-                if opt_data:
-                    options.append(NuschtoOption.model_validate(opt_data))
+                opt = _get_option_by_idx(instance, result.idx, index_data)
+                if opt:
+                    options.append(opt)
+
+        return options
 
+    @staticmethod
+    def list_options(project: str) -> list[NuschtoOption]:
+        """Get every option of a project, reading metadata chunks until the last one."""
+        instance, index_data, scope_id = NuschtosSearch._get_project_context(project)
+        chunk_size = index_data.meta.chunk_size
+        offline = snapshot.get_active()
+        chunk_count = offline.chunk_count(instance) if offline is not None else None
+
+        options = []
+        chunk = 0
+        while chunk_count is None or chunk < chunk_count:
+            try:
+                chunk_data = _get_chunk(instance, chunk, index_data)
+            except APIError as e:
+                if isinstance(e.__cause__, requests.HTTPError) and e.__cause__.response.status_code == 404:
+                    break
+                raise
+            for pos, opt in enumerate(chunk_data):
+                idx = chunk * chunk_size + pos
+                # Instances holding several projects share chunks, keep this project's options
+                if scope_id is None or index_data.index.get_idx_by_name(scope_id, opt.name) == idx:
+                    options.append(opt)
+            if len(chunk_data) < chunk_size:
+                break
+            chunk += 1
         return options
 
+    @staticmethod
+    def get_revision(project: str) -> str | None:
+        """Get the identity of a project's search index, fetching it if needed."""
+        NuschtosSearch._validate_project(project)
+        return _cache.token(f"{INSTANCES[_get_instance_for_project(project)]}/index.ixx")
+
     @staticmethod
     def list_projects() -> list[dict]:
         """List available projects."""
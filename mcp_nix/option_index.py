@@ -0,0 +1,218 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Local option index shared by all option backends.
+
+When enabled, each project's options are ingested once per upstream revision and
+kept on disk as a sorted name table plus an inverted index over name and
+description words. Lookups, child listings and name prefix matches bisect the
+name tables; searches rank with BM25 plus boosts for name matches, so every
+project is ranked the same way.
+"""
+
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from .cache import get_cache
+from .models import SearchResult
+from .search import InvalidLimitError
+
+if TYPE_CHECKING:
+    from .options import UnifiedOption
+
+INDEX_VERSION = 3
+INDEX_EXPIRE = 7 * 24 * 60 * 60  # Indexes of older revisions are dropped after a week
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+NAME_WEIGHT = 2  # Name words count as this many occurrences
+MAX_POSTINGS = 1000  # Options scored per query word, those the word weighs most in
+
+EXACT_MATCH_BOOST = 100.0
+NAME_PREFIX_BOOST = 20.0
+NAME_MATCH_BOOST = 10.0  # Name matches rank above description matches, like the remote query
+
+_cache = get_cache("option-index")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_enabled = False
+_indexes: dict[tuple[str, str], "OptionIndex"] = {}  # (project, version) -> index of the current revision
+_build_locks: dict[tuple[str, str], threading.Lock] = {}
+_lock = threading.Lock()
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _weight(count: int, length: int, avg_length: float) -> float:
+    """BM25 weight of a word occurring count times in an option of length words, before idf."""
+    norm = 1 - B + B * length / avg_length
+    return count * (K1 + 1) / (count + K1 * norm)
+
+
+@dataclass
+class OptionIndex:
+    """Options of one project revision, sorted by name, with an inverted index over their words."""
+
+    revision: str | None
+    options: list["UnifiedOption"]
+    names: list[str] = field(default_factory=list)
+    # Lowercased names in sorted order, and the option id of each, for prefix matches
+    folded_names: list[str] = field(default_factory=list)
+    folded_ids: list[int] = field(default_factory=list)
+    # word -> (option id, frequency); past MAX_POSTINGS, by descending BM25 weight of the word in the option
+    postings: dict[str, list[tuple[int, int]]] = field(default_factory=dict)
+    lengths: list[int] = field(default_factory=list)  # Words per option
+    # Lowercased names joined by newlines, so name substrings are found with str.find
+    name_text: str = ""
+    name_offsets: list[int] = field(default_factory=list)
+
+    @classmethod
+    def build(cls, revision: str | None, options: list["UnifiedOption"]) -> "OptionIndex":
+        options = sorted(options, key=lambda opt: opt.name)
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = []
+        for i, opt in enumerate(options):
+            words = Counter(_tokens(opt.description))
+            for word in _tokens(opt.name):
+                words[word] += NAME_WEIGHT
+            for word, count in words.items():
+                postings.setdefault(word, []).append((i, count))
+            lengths.append(sum(words.values()))
+        avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        for word_postings in postings.values():
+            if len(word_postings) > MAX_POSTINGS:
+                word_postings.sort(key=lambda posting: -_weight(posting[1], lengths[posting[0]], avg_length))
+
+        names = [opt.name for opt in options]
+        folded = sorted((name.lower(), i) for i, name in enumerate(names))
+        offsets = []
+        pos = 0
+        for name in names:
+            offsets.append(pos)
+            pos += len(name) + 1
+        return cls(
+            revision=revision,
+            options=options,
+            names=names,
+            folded_names=[name for name, _ in folded],
+            folded_ids=[i for _, i in folded],
+            postings=postings,
+            lengths=lengths,
+            name_text="\n".join(name.lower() for name in names),
+            name_offsets=offsets,
+        )
+
+    def get(self, name: str) -> "UnifiedOption | None":
+        i = bisect.bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            return self.options[i]
+        return None
+
+    def children(self, prefix: str) -> list["UnifiedOption"]:
+        start = bisect.bisect_left(self.names, f"{prefix}.")
+        end = bisect.bisect_left(self.names, f"{prefix}/")  # "/" sorts right after "."
+        return self.options[start:end]
+
+    def _name_prefix_matches(self, needle: str) -> list[int]:
+        """Get the ids of options whose lowercased name starts with needle."""
+        start = bisect.bisect_left(self.folded_names, needle)
+        end = bisect.bisect_left(self.folded_names, needle + "\uffff")
+        return self.folded_ids[start:end]
+
+    def _name_matches(self, needle: str) -> set[int]:
+        """Get the ids of options whose lowercased name contains needle."""
+        if not needle or "\n" in needle:
+            return set()
+        matches = set()
+        pos = self.name_text.find(needle)
+        while pos >= 0:
+            i = bisect.bisect_right(self.name_offsets, pos) - 1
+            matches.add(i)
+            # Continue after this name
+            pos = self.name_text.find(needle, self.name_offsets[i] + len(self.names[i]) + 1)
+        return matches
+
+    def search(self, query: str, limit: int) -> SearchResult["UnifiedOption"]:
+        """Rank options by BM25 over their words, boosting options whose name matches the query."""
+        if not 1 <= limit <= 100:
+            raise InvalidLimitError(limit)
+
+        scores: Counter[int] = Counter()
+        needle = query.strip().lower()
+        for i in self._name_matches(needle):
+            scores[i] += NAME_MATCH_BOOST
+        if needle:
+            for i in self._name_prefix_matches(needle):
+                scores[i] += EXACT_MATCH_BOOST if self.names[i].lower() == needle else NAME_PREFIX_BOOST
+
+        total_docs = len(self.options)
+        avg_length = sum(self.lengths) / total_docs if total_docs else 0.0
+        total = 0  # At least the options matching the most common query word
+        for word in set(_tokens(query)):
+            postings = self.postings.get(word, [])
+            if not postings:
+                continue
+            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            # Words in most options add little to any score, so only their heaviest postings are scored
+            for i, count in postings[:MAX_POSTINGS]:
+                scores[i] += idf * _weight(count, self.lengths[i], avg_length)
+            total = max(total, len(postings))
+
+        ranked = heapq.nsmallest(limit, scores, key=lambda i: (-scores[i], len(self.names[i]), self.names[i]))
+        return SearchResult(items=[self.options[i] for i in ranked], total=max(total, len(scores)))
+
+
+def enable() -> None:
+    """Answer option queries from local indexes."""
+    global _enabled
+    _enabled = True
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _check_index(value: object) -> OptionIndex:
+    if not isinstance(value, OptionIndex):
+        raise TypeError(f"Expected an OptionIndex, got {type(value).__name__}")
+    return value
+
+
+def get_index(
+    project: str, version: str, revision: str | None, load: Callable[[], list["UnifiedOption"]]
+) -> OptionIndex:
+    """Get the option index of a project version, building it from load() on first use for each revision.
+
+    A revision identifies the upstream data, so the index is rebuilt when it changes.
+    Without one, the last index built is kept, and a first one is only kept in memory.
+    """
+    key = (project, version)
+    local = _indexes.get(key)
+    if local is not None and revision in (None, local.revision):
+        return local
+
+    with _lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    with build_lock:
+        local = _indexes.get(key)
+        if local is None or revision not in (None, local.revision):
+            if revision is None:
+                local = OptionIndex.build(revision, load())
+            else:
+                local = _cache.get_or_set(
+                    (project, version, revision, INDEX_VERSION),
+                    lambda: OptionIndex.build(revision, load()),
+                    callback=_check_index,
+                    expire=INDEX_EXPIRE,
+                )
+            _indexes[key] = local
+    return local
@@ -1,10 +1,15 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Unified options abstraction layer for all Nix projects."""
 
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from typing import Protocol
 
-from .cache import APIError
+from . import option_index
+from .cache import DEFAULT_EXPIRE, APIError
 from .models import SearchResult, _lines
 
 # =============================================================================
@@ -24,9 +29,9 @@ class UnifiedOption:
     declaration_url: str | None
     project: str
 
-    def format_short(self) -> str:
+    def format_short(self, *, with_project: bool = False) -> str:
         """Format for search results listing."""
-        lines = [f"• {self.name}"]
+        lines = [f"• {self.name} ({self.project})" if with_project else f"• {self.name}"]
         if self.type:
             lines.append(f"  Type: {self.type}")
         if self.description:
@@ -90,6 +95,10 @@ class OptionsBackend(Protocol):
         """Get option by exact name."""
         ...
 
+    def get_options(self, names: list[str], version: str) -> dict[str, UnifiedOption | None]:
+        """Get several options by exact name, mapping missing ones to None."""
+        ...
+
     def get_option_children(self, prefix: str, version: str) -> list[UnifiedOption]:
         """Get all child options under a prefix."""
         ...
@@ -110,6 +119,66 @@ class OptionsBackend(Protocol):
         """Whether this backend supports reading declaration source code."""
         ...
 
+    def build_index(self, version: str) -> None:
+        """Build the local option index of a version ahead of the first query."""
+        ...
+
+
+# =============================================================================
+# Version registry
+# =============================================================================
+
+
+class VersionRegistry:
+    """Set of a backend's valid versions, so validating a version is a set lookup.
+
+    The versions are loaded on first use. Once older than the refresh interval they
+    are reloaded in a background thread while lookups keep using the previous set.
+    """
+
+    def __init__(self, load: Callable[[], Iterable[str]], refresh_interval: float = DEFAULT_EXPIRE):
+        self._load = load
+        self._refresh_interval = refresh_interval
+        self._versions: frozenset[str] | None = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._refresh_thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, version: str) -> bool:
+        versions = self._versions
+        if versions is None:
+            with self._lock:
+                if self._versions is None:
+                    self._refresh()
+                versions = self._versions
+            assert versions is not None
+        elif time.monotonic() - self._loaded_at > self._refresh_interval:
+            self._refresh_in_background()
+        return version in versions
+
+    def _refresh(self) -> None:
+        self._versions = frozenset(self._load())
+        self._loaded_at = time.monotonic()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._refresh_thread = threading.Thread(
+                target=self._background_refresh, name="mcp-nix-versions", daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self._refresh()
+        except Exception:
+            pass  # Keep the previous versions, the next lookup retries; stderr stays quiet for stdio
+        finally:
+            self._refreshing = False
+
 
 # =============================================================================
 # Client classes (thin wrappers around existing search modules)
@@ -130,9 +199,25 @@ class NixOSClient:
     def get_option(self, name: str, channel: str):
         return self._search.get_option(name, channel)
 
+    def get_options(self, names: list[str], channel: str):
+        return self._search.get_options(names, channel)
+
     def get_option_children(self, prefix: str, channel: str):
         return self._search.get_option_children(prefix, channel)
 
+    def list_options(self, channel: str):
+        return self._search.list_options(channel)
+
+    def get_revision(self, channel: str) -> str:
+        from .search import InvalidChannelError, get_config
+        from .sources import get_channel_revision
+
+        channels = get_config().channels
+        branch = next((ch["branch"] for ch in channels if ch["id"] == channel), None)
+        if branch is None:
+            raise InvalidChannelError(channel, [ch["id"] for ch in channels])
+        return get_channel_revision(branch)
+
     def list_channels(self):
         return self._search.list_channels()
 
@@ -154,6 +239,12 @@ class HomeManagerClient:
     def get_option_children(self, prefix: str, release: str):
         return self._search.get_option_children(prefix, release)
 
+    def list_options(self, release: str):
+        return self._search.list_options(release)
+
+    def get_revision(self, release: str) -> str | None:
+        return self._search.get_revision(release)
+
     def list_releases(self):
         return self._search.list_releases()
 
@@ -175,6 +266,12 @@ class NuschtosClient:
     def get_option_children(self, prefix: str, project: str):
         return self._search.get_option_children(prefix, project)
 
+    def list_options(self, project: str):
+        return self._search.list_options(project)
+
+    def get_revision(self, project: str) -> str | None:
+        return self._search.get_revision(project)
+
 
 class NixNomadClient:
     """Client wrapping nix_nomad.py NixNomadSearch."""
@@ -193,6 +290,12 @@ class NixNomadClient:
     def get_option_children(self, prefix: str):
         return self._search.get_option_children(prefix)
 
+    def list_options(self):
+        return self._search.list_options()
+
+    def get_revision(self) -> str | None:
+        return self._search.get_revision()
+
 
 # =============================================================================
 # Backend implementations
@@ -210,19 +313,33 @@ class NixOSOptionsBackend:
 
     def __init__(self):
         self._client = NixOSClient()
+        self._versions = VersionRegistry(lambda: (ch.id for ch in self._client.list_channels()))
 
     def search_options(self, query: str, limit: int, version: str) -> SearchResult[UnifiedOption]:
+        if option_index.is_enabled():
+            return self._local_index(version).search(query, limit)
         result = self._client.search_options(query, limit, version)
         items = [self._to_unified(opt, version) for opt in result.items]
         return SearchResult(items=items, total=result.total)
 
     def get_option(self, name: str, version: str) -> UnifiedOption | None:
+        if option_index.is_enabled():
+            return self._local_index(version).get(name)
         opt = self._client.get_option(name, version)
         if opt is None:
             return None
         return self._to_unified(opt, version)
 
+    def get_options(self, names: list[str], version: str) -> dict[str, UnifiedOption | None]:
+        if option_index.is_enabled():
+            index = self._local_index(version)
+            return {name: index.get(name) for name in names}
+        options = self._client.get_options(names, version)
+        return {name: self._to_unified(opt, version) if opt else None for name, opt in options.items()}
+
     def get_option_children(self, prefix: str, version: str) -> list[UnifiedOption]:
+        if option_index.is_enabled():
+            return self._local_index(version).children(prefix)
         children = self._client.get_option_children(prefix, version)
         return [self._to_unified(opt, version) for opt in children]
 
@@ -234,9 +351,7 @@ class NixOSOptionsBackend:
         return "unstable"
 
     def validate_version(self, version: str) -> tuple[str, str | None]:
-        channels = self._client.list_channels()
-        valid_ids = [ch.id for ch in channels]
-        if version in valid_ids:
+        if version in self._versions:
             return (version, None)
         default = self.get_default_version()
         return (default, f"Version '{version}' not found, using '{default}' instead.")
@@ -244,6 +359,17 @@ class NixOSOptionsBackend:
     def supports_declaration_read(self) -> bool:
         return True
 
+    def build_index(self, version: str) -> None:
+        self._local_index(version)
+
+    def _local_index(self, version: str) -> option_index.OptionIndex:
+        return option_index.get_index(
+            "nixos",
+            version,
+            self._client.get_revision(version),
+            lambda: [self._to_unified(opt, version) for opt in self._client.list_options(version)],
+        )
+
     def _to_unified(self, opt, version: str) -> UnifiedOption:
         from .models import Option
 
@@ -265,19 +391,29 @@ class HomeManagerOptionsBackend:
 
     def __init__(self):
         self._client = HomeManagerClient()
+        self._versions = VersionRegistry(self._load_versions)
 
     def search_options(self, query: str, limit: int, version: str) -> SearchResult[UnifiedOption]:
+        if option_index.is_enabled():
+            return self._local_index(version).search(query, limit)
         result = self._client.search_options(query, limit, version)
         items = [self._to_unified(opt) for opt in result.items]
         return SearchResult(items=items, total=result.total)
 
     def get_option(self, name: str, version: str) -> UnifiedOption | None:
+        if option_index.is_enabled():
+            return self._local_index(version).get(name)
         opt = self._client.get_option(name, version)
         if opt is None:
             return None
         return self._to_unified(opt)
 
+    def get_options(self, names: list[str], version: str) -> dict[str, UnifiedOption | None]:
+        return {name: self.get_option(name, version) for name in names}
+
     def get_option_children(self, prefix: str, version: str) -> list[UnifiedOption]:
+        if option_index.is_enabled():
+            return self._local_index(version).children(prefix)
         children = self._client.get_option_children(prefix, version)
         return [self._to_unified(opt) for opt in children]
 
@@ -289,10 +425,7 @@ class HomeManagerOptionsBackend:
         return "unstable"
 
     def validate_version(self, version: str) -> tuple[str, str | None]:
-        releases = self._client.list_releases()
-        valid_names = [r.name for r in releases]
-        valid_values = [r.value for r in releases]
-        if version in valid_names or version in valid_values or version == "unstable":
+        if version in self._versions:
             return (version, None)
         default = self.get_default_version()
         return (default, f"Version '{version}' not found, using '{default}' instead.")
@@ -300,6 +433,21 @@ class HomeManagerOptionsBackend:
     def supports_declaration_read(self) -> bool:
         return True
 
+    def _load_versions(self) -> set[str]:
+        releases = self._client.list_releases()
+        return {r.name for r in releases} | {r.value for r in releases} | {"unstable"}
+
+    def build_index(self, version: str) -> None:
+        self._local_index(version)
+
+    def _local_index(self, version: str) -> option_index.OptionIndex:
+        return option_index.get_index(
+            "homemanager",
+            version,
+            self._client.get_revision(version),
+            lambda: [self._to_unified(opt) for opt in self._client.list_options(version)],
+        )
+
     def _to_unified(self, opt) -> UnifiedOption:
         from .models import HomeManagerOption
 
@@ -325,17 +473,26 @@ class NuschtosOptionsBackend:
 
     def search_options(self, query: str, limit: int, version: str) -> SearchResult[UnifiedOption]:
         # Version is ignored - these projects don't have versions
+        if option_index.is_enabled():
+            return self._local_index().search(query, limit)
         result = self._client.search_options(query, limit, self._project_id)
         items = [self._to_unified(opt) for opt in result.items]
         return SearchResult(items=items, total=result.total)
 
     def get_option(self, name: str, version: str) -> UnifiedOption | None:
+        if option_index.is_enabled():
+            return self._local_index().get(name)
         opt = self._client.get_option(name, self._project_id)
         if opt is None:
             return None
         return self._to_unified(opt)
 
+    def get_options(self, names: list[str], version: str) -> dict[str, UnifiedOption | None]:
+        return {name: self.get_option(name, version) for name in names}
+
     def get_option_children(self, prefix: str, version: str) -> list[UnifiedOption]:
+        if option_index.is_enabled():
+            return self._local_index().children(prefix)
         children = self._client.get_option_children(prefix, self._project_id)
         return [self._to_unified(opt) for opt in children]
 
@@ -354,6 +511,17 @@ class NuschtosOptionsBackend:
     def supports_declaration_read(self) -> bool:
         return True
 
+    def build_index(self, version: str) -> None:
+        self._local_index()
+
+    def _local_index(self) -> option_index.OptionIndex:
+        return option_index.get_index(
+            self._project_id,
+            "latest",
+            self._client.get_revision(self._project_id),
+            lambda: [self._to_unified(opt) for opt in self._client.list_options(self._project_id)],
+        )
+
     def _to_unified(self, opt) -> UnifiedOption:
         from .nuschtos import NuschtoOption
 
@@ -377,17 +545,26 @@ class NixNomadOptionsBackend:
         self._client = NixNomadClient()
 
     def search_options(self, query: str, limit: int, version: str) -> SearchResult[UnifiedOption]:
+        if option_index.is_enabled():
+            return self._local_index().search(query, limit)
         result = self._client.search_options(query, limit)
         items = [self._to_unified(opt) for opt in result.items]
         return SearchResult(items=items, total=result.total)
 
     def get_option(self, name: str, version: str) -> UnifiedOption | None:
+        if option_index.is_enabled():
+            return self._local_index().get(name)
         opt = self._client.get_option(name)
         if opt is None:
             return None
         return self._to_unified(opt)
 
+    def get_options(self, names: list[str], version: str) -> dict[str, UnifiedOption | None]:
+        return {name: self.get_option(name, version) for name in names}
+
     def get_option_children(self, prefix: str, version: str) -> list[UnifiedOption]:
+        if option_index.is_enabled():
+            return self._local_index().children(prefix)
         children = self._client.get_option_children(prefix)
         return [self._to_unified(opt) for opt in children]
 
@@ -406,6 +583,17 @@ class NixNomadOptionsBackend:
         # nix-nomad options are auto-generated from Nomad HCL, no readable source
         return False
 
+    def build_index(self, version: str) -> None:
+        self._local_index()
+
+    def _local_index(self) -> option_index.OptionIndex:
+        return option_index.get_index(
+            "nix-nomad",
+            "latest",
+            self._client.get_revision(),
+            lambda: [self._to_unified(opt) for opt in self._client.list_options()],
+        )
+
     def _to_unified(self, opt) -> UnifiedOption:
         from .nix_nomad import NixNomadOption
 
@@ -475,3 +663,100 @@ def get_backend(project: str) -> OptionsBackend:
         _backend_instances[project] = _create_backend(project)
 
     return _backend_instances[project]
+
+
+# =============================================================================
+# Federated search
+# =============================================================================
+
+FEDERATED_TIMEOUT = 10.0  # Seconds a backend gets before its results are left out
+# Backends that download and parse a whole options dump on a cold cache get longer
+BACKEND_TIMEOUTS: dict[str, float] = {
+    project: 20.0 for project in SUPPORTED_PROJECTS if project not in ("nixos", "nix-nomad")
+}
+
+# Backend searches of concurrent federated searches. A search that outlives its
+# timeout can't be cancelled and keeps its worker, so there are spare workers to
+# keep later searches from queueing behind it.
+_search_executor = ThreadPoolExecutor(max_workers=4 * len(SUPPORTED_PROJECTS), thread_name_prefix="mcp-nix-options")
+
+
+@dataclass
+class FederatedSearchResult:
+    """Options merged from several projects, and the projects that didn't answer."""
+
+    items: list[UnifiedOption]
+    total: int
+    failed: dict[str, str]  # project -> reason
+
+
+def resolve_projects(project: str) -> list[str]:
+    """Parse "all" or a comma-separated list of projects."""
+    if project.strip() == "all":
+        return list(SUPPORTED_PROJECTS)
+    projects = list(dict.fromkeys(p.strip() for p in project.split(",") if p.strip()))
+    for name in projects:
+        if name not in SUPPORTED_PROJECTS:
+            raise InvalidProjectError(name, SUPPORTED_PROJECTS)
+    if not projects:
+        raise InvalidProjectError(project, SUPPORTED_PROJECTS)
+    return projects
+
+
+def _search_project(project: str, query: str, limit: int, version: str) -> SearchResult[UnifiedOption]:
+    backend = get_backend(project)
+    effective_version, _ = backend.validate_version(version or backend.get_default_version())
+    return backend.search_options(query, limit, effective_version)
+
+
+def _rank_key(opt: UnifiedOption, query: str, rank: int) -> tuple[int, int, int]:
+    """Order options across projects: by how well the name matches, then by each backend's own ranking."""
+    name = opt.name.lower()
+    if name == query:
+        tier = 0
+    elif name.startswith(query) or name.rsplit(".", 1)[-1] == query:
+        tier = 1
+    elif query in name:
+        tier = 2
+    else:
+        tier = 3
+    return (tier, rank, len(name))
+
+
+def search_all(
+    query: str, limit: int, projects: list[str], version: str = "", *, timeout: float | None = None
+) -> FederatedSearchResult:
+    """Search several projects concurrently and merge their results.
+
+    A version that a project doesn't know falls back to its default. Projects that
+    fail or don't answer within their timeout (BACKEND_TIMEOUTS, or timeout for all
+    of them when given) are reported in `failed`, and the results of the others
+    are returned.
+    """
+    start = time.monotonic()
+    futures = {
+        project: _search_executor.submit(_search_project, project, query, limit, version) for project in projects
+    }
+    for project, future in futures.items():
+        project_timeout = timeout if timeout is not None else BACKEND_TIMEOUTS.get(project, FEDERATED_TIMEOUT)
+        wait([future], timeout=max(start + project_timeout - time.monotonic(), 0))
+
+    ranked: list[tuple[tuple[int, int, int], UnifiedOption]] = []
+    total = 0
+    failed: dict[str, str] = {}
+    needle = query.strip().lower()
+    for project, future in futures.items():
+        if not future.done():
+            future.cancel()
+            failed[project] = "timed out"
+            continue
+        try:
+            result = future.result()
+        except Exception as e:
+            failed[project] = str(e) or type(e).__name__
+            continue
+        total += result.total
+        ranked.extend((_rank_key(opt, needle, rank), opt) for rank, opt in enumerate(result.items))
+
+    ranked.sort(key=lambda item: item[0])
+    return FederatedSearchResult(items=[opt for _, opt in ranked[:limit]], total=total, failed=failed)
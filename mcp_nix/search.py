@@ -3,16 +3,31 @@
 
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Any
 
 import requests
 
+from . import snapshot
 from .cache import APIError, get_cache
 from .models import Channel, Option, Package, SearchResult
+from .utils import render_html_fields
 
 _cache = get_cache("search")
 
+ALL_BATCH_SIZE = 1000  # Page size when fetching every result of a query
+MAX_RESULT_WINDOW = 10_000  # Elasticsearch's default cap on from + size
+RESULT_EXPIRE = 5 * 60  # Search results are cached briefly, channels update a few times a day
+
+# Fields the models read, requested instead of whole documents (which also carry
+# programs, outputs, flake info and more)
+OPTION_FIELDS = [field.alias or name for name, field in Option.model_fields.items()]
+PACKAGE_FIELDS = [field.alias or name for name, field in Package.model_fields.items()]
+
+# Page requests of concurrent _es_query_all calls
+_page_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="mcp-nix-es")
+
 
 # Re-export for backward compatibility
 __all__ = ["APIError", "InvalidChannelError", "InvalidLimitError", "NixOSSearch"]
@@ -57,7 +72,7 @@ def get_config() -> ElasticsearchConfig:
             default_channel=channels_data["default"],
         )
 
-    return _cache.request("https://search.nixos.org/bundle.js", parse_bundle)
+    return _cache.request_derived("https://search.nixos.org/bundle.js", parse_bundle)
 
 
 def get_channels() -> dict[str, str]:
@@ -87,6 +102,59 @@ def get_api_url() -> str:
     return config.url
 
 
+def _search_body(
+    query: dict[str, Any],
+    size: int,
+    from_: int,
+    *,
+    sort: list[dict[str, Any]] | None = None,
+    search_after: list[Any] | None = None,
+    source: list[str] | None = None,
+) -> dict[str, Any]:
+    """Build an ES search request body."""
+    body: dict[str, Any] = {"query": query, "size": size, "from": from_}
+    if sort is not None:
+        body["sort"] = sort
+    if search_after is not None:
+        body["search_after"] = search_after
+    if source is not None:
+        body["_source"] = source
+    return body
+
+
+def _result_key(index: str, body: dict[str, Any]) -> tuple[str, str, str]:
+    """Cache key of a search result.
+
+    The index name changes with the channel's schema version, so stale indexes are never hit.
+    """
+    return ("es", index, json.dumps(body, sort_keys=True))
+
+
+def _parse_hits(data: Any) -> tuple[list[dict[str, Any]], int]:
+    """Extract (hits, total_count) from an ES search response."""
+    if isinstance(data, dict) and "hits" in data:
+        hits_data = data.get("hits", {})
+        if isinstance(hits_data, dict):
+            hits = list(hits_data.get("hits", []))
+            total = hits_data.get("total", {})
+            total_count = total.get("value", 0) if isinstance(total, dict) else total
+            return hits, total_count
+    return [], 0
+
+
+def _check_result(result: tuple[list[dict[str, Any]], int]) -> tuple[list[dict[str, Any]], int]:
+    """Validate a cached (hits, total_count) result."""
+    hits, total = result
+    if not isinstance(hits, list) or not isinstance(total, int):
+        raise TypeError("Unexpected cached search result")
+    return hits, total
+
+
+def _option_source(hit: dict[str, Any]) -> dict[str, Any]:
+    """Extract an option document from a hit, with its HTML description rendered to text."""
+    return render_html_fields(hit.get("_source", {}), ("option_description",))
+
+
 class InvalidChannelError(APIError):
     """Raised when an invalid channel is specified."""
 
@@ -109,28 +177,95 @@ class NixOSSearch:
 
     @staticmethod
     def _es_query(
-        index: str, query: dict[str, Any], size: int = 20, from_: int = 0
+        index: str,
+        query: dict[str, Any],
+        size: int = 20,
+        from_: int = 0,
+        *,
+        sort: list[dict[str, Any]] | None = None,
+        search_after: list[Any] | None = None,
+        source: list[str] | None = None,
     ) -> tuple[list[dict[str, Any]], int]:
-        """Execute ES query and return (hits, total_count)."""
+        """Execute ES query and return (hits, total_count).
+
+        source limits the document fields returned, None returns whole documents.
+        Results are cached for a few minutes, so popular queries are served locally.
+        """
+        offline = snapshot.get_active()
+        if offline is not None:
+            return offline.search(index, query, size=size, from_=from_, sort=sort, search_after=search_after)
+
+        body = _search_body(query, size, from_, sort=sort, search_after=search_after, source=source)
+
+        def fetch() -> tuple[list[dict[str, Any]], int]:
+            return NixOSSearch._es_post(index, body)
+
+        if search_after is not None:
+            # Deep pages of a scan are only requested once
+            return fetch()
+
+        hits, total = _cache.get_or_set(_result_key(index, body), fetch, callback=_check_result, expire=RESULT_EXPIRE)
+        return list(hits), total  # Callers may extend the list
+
+    @staticmethod
+    def _es_msearch(index: str, bodies: list[dict[str, Any]]) -> list[tuple[list[dict[str, Any]], int]]:
+        """Execute several ES searches in one _msearch round trip. Returns (hits, total_count) per body.
+
+        Results share the cache of `_es_query`, and only uncached searches are sent.
+        """
+        offline = snapshot.get_active()
+        if offline is not None:
+            return [offline.search(index, body["query"], size=body["size"], from_=body["from"]) for body in bodies]
+
+        results: list[tuple[list[dict[str, Any]], int] | None] = [_cache.get(_result_key(index, b)) for b in bodies]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if len(missing) == 1:
+            results[missing[0]] = NixOSSearch._es_post(index, bodies[missing[0]])
+        elif missing:
+            fetched = NixOSSearch._es_msearch_post(index, [bodies[i] for i in missing])
+            for i, result in zip(missing, fetched, strict=True):
+                results[i] = result
+        for i in missing:
+            _cache.set(_result_key(index, bodies[i]), results[i], expire=RESULT_EXPIRE)
+        return [(list(result[0]), result[1]) for result in results if result is not None]
+
+    @staticmethod
+    def _es_post(index: str, body: dict[str, Any]) -> tuple[list[dict[str, Any]], int]:
+        """Send a search request to ES and return (hits, total_count)."""
         api_url = get_api_url()
         auth = get_auth()
         try:
             resp = requests.post(
                 f"{api_url}/{index}/_search",
-                json={"query": query, "size": size, "from": from_},
+                json=body,
+                auth=auth,
+                timeout=10,
+            )
+            resp.raise_for_status()
+            return _parse_hits(resp.json())
+        except requests.Timeout as exc:
+            raise APIError("Connection timed out") from exc
+        except requests.HTTPError as exc:
+            raise APIError(str(exc)) from exc
+        except Exception as exc:
+            raise APIError(str(exc)) from exc
+
+    @staticmethod
+    def _es_msearch_post(index: str, bodies: list[dict[str, Any]]) -> list[tuple[list[dict[str, Any]], int]]:
+        """Send several search requests to ES as one _msearch request."""
+        api_url = get_api_url()
+        auth = get_auth()
+        payload = "".join(f"{{}}\n{json.dumps(body)}\n" for body in bodies)
+        try:
+            resp = requests.post(
+                f"{api_url}/{index}/_msearch",
+                data=payload,
+                headers={"Content-Type": "application/x-ndjson"},
                 auth=auth,
                 timeout=10,
             )
             resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, dict) and "hits" in data:
-                hits_data = data.get("hits", {})
-                if isinstance(hits_data, dict):
-                    hits = list(hits_data.get("hits", []))
-                    total = hits_data.get("total", {})
-                    total_count = total.get("value", 0) if isinstance(total, dict) else total
-                    return hits, total_count
-            return [], 0
+            responses = resp.json().get("responses", [])
         except requests.Timeout as exc:
             raise APIError("Connection timed out") from exc
         except requests.HTTPError as exc:
@@ -138,19 +273,51 @@ class NixOSSearch:
         except Exception as exc:
             raise APIError(str(exc)) from exc
 
+        if len(responses) != len(bodies):
+            raise APIError(f"Expected {len(bodies)} search responses, got {len(responses)}")
+        for response in responses:
+            if "error" in response:
+                error = response["error"]
+                raise APIError(f"Search failed: {error.get('reason', error) if isinstance(error, dict) else error}")
+        return [_parse_hits(response) for response in responses]
+
     @staticmethod
-    def _es_query_all(index: str, query: dict[str, Any], batch_size: int = 100) -> list[dict[str, Any]]:
-        """Fetch all results using pagination."""
-        all_hits = []
-        from_ = 0
-        while True:
-            hits, _ = NixOSSearch._es_query(index, query, size=batch_size, from_=from_)
-            if not hits:
-                break
+    def _es_query_all(
+        index: str,
+        query: dict[str, Any],
+        *,
+        sort_field: str = "option_name",
+        batch_size: int = ALL_BATCH_SIZE,
+        source: list[str] | None = None,
+        concurrent: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Fetch all results, sorted by sort_field, which must be a unique keyword field.
+
+        Pages with search_after, which unlike from/size isn't capped by the index's
+        result window and stays cheap deep into the results. With concurrent, the
+        first page's total is used to request the remaining pages in parallel
+        instead, as long as they fit in the result window.
+        """
+        sort = [{sort_field: "asc"}]
+        hits, total = NixOSSearch._es_query(index, query, size=batch_size, sort=sort, source=source)
+        if len(hits) < batch_size:
+            return hits
+
+        if concurrent and total < MAX_RESULT_WINDOW:
+            pages = _page_executor.map(
+                lambda from_: NixOSSearch._es_query(
+                    index, query, size=batch_size, from_=from_, sort=sort, source=source
+                )[0],
+                range(batch_size, total, batch_size),
+            )
+            return hits + [hit for page in pages for hit in page]
+
+        all_hits = hits
+        while len(hits) == batch_size:
+            hits, _ = NixOSSearch._es_query(
+                index, query, size=batch_size, sort=sort, search_after=hits[-1]["sort"], source=source
+            )
             all_hits.extend(hits)
-            if len(hits) < batch_size:
-                break
-            from_ += batch_size
         return all_hits
 
     @staticmethod
@@ -171,6 +338,8 @@ class NixOSSearch:
         """Search for NixOS packages."""
         NixOSSearch._validate_limit(limit)
         index = NixOSSearch._get_channel_index(channel)
+        # Matches are case-insensitive, so equivalent queries share a cached result
+        query = query.strip().lower()
 
         q = {
             "bool": {
@@ -183,7 +352,7 @@ class NixOSSearch:
             }
         }
 
-        hits, total = NixOSSearch._es_query(index, q, limit)
+        hits, total = NixOSSearch._es_query(index, q, limit, source=PACKAGE_FIELDS)
         packages = [Package.model_validate(hit.get("_source", {})) for hit in hits]
         return SearchResult(items=packages, total=total)
 
@@ -192,20 +361,21 @@ class NixOSSearch:
         """Search for NixOS options."""
         NixOSSearch._validate_limit(limit)
         index = NixOSSearch._get_channel_index(channel)
+        query = query.strip().lower()
 
         q = {
             "bool": {
                 "must": [{"term": {"type": "option"}}],
                 "should": [
-                    {"wildcard": {"option_name": f"*{query}*"}},
+                    {"wildcard": {"option_name": {"value": f"*{query}*", "case_insensitive": True}}},
                     {"match": {"option_description": query}},
                 ],
                 "minimum_should_match": 1,
             }
         }
 
-        hits, total = NixOSSearch._es_query(index, q, limit)
-        options = [Option.model_validate(hit.get("_source", {})) for hit in hits]
+        hits, total = NixOSSearch._es_query(index, q, limit, source=OPTION_FIELDS)
+        options = [Option.model_validate(_option_source(hit)) for hit in hits]
         return SearchResult(items=options, total=total)
 
     @staticmethod
@@ -213,7 +383,7 @@ class NixOSSearch:
         """Get detailed info about a package."""
         index = NixOSSearch._get_channel_index(channel)
         query = {"bool": {"must": [{"term": {"type": "package"}}, {"term": {"package_pname": name}}]}}
-        hits, _ = NixOSSearch._es_query(index, query, 1)
+        hits, _ = NixOSSearch._es_query(index, query, 1, source=PACKAGE_FIELDS)
         if not hits:
             return None
         return Package.model_validate(hits[0].get("_source", {}))
@@ -223,10 +393,50 @@ class NixOSSearch:
         """Get detailed info about an option."""
         index = NixOSSearch._get_channel_index(channel)
         query = {"bool": {"must": [{"term": {"type": "option"}}, {"term": {"option_name": name}}]}}
-        hits, _ = NixOSSearch._es_query(index, query, 1)
+        hits, _ = NixOSSearch._es_query(index, query, 1, source=OPTION_FIELDS)
         if not hits:
             return None
-        return Option.model_validate(hits[0].get("_source", {}))
+        return Option.model_validate(_option_source(hits[0]))
+
+    @staticmethod
+    def get_packages(names: list[str], channel: str) -> dict[str, Package | None]:
+        """Get several packages by exact name in one round trip. Missing packages map to None."""
+        index = NixOSSearch._get_channel_index(channel)
+        names = list(dict.fromkeys(names))
+        bodies = [
+            _search_body(
+                {"bool": {"must": [{"term": {"type": "package"}}, {"term": {"package_pname": name}}]}},
+                1,
+                0,
+                source=PACKAGE_FIELDS,
+            )
+            for name in names
+        ]
+        results = NixOSSearch._es_msearch(index, bodies)
+        return {
+            name: Package.model_validate(hits[0].get("_source", {})) if hits else None
+            for name, (hits, _) in zip(names, results, strict=True)
+        }
+
+    @staticmethod
+    def get_options(names: list[str], channel: str) -> dict[str, Option | None]:
+        """Get several options by exact name in one round trip. Missing options map to None."""
+        index = NixOSSearch._get_channel_index(channel)
+        names = list(dict.fromkeys(names))
+        bodies = [
+            _search_body(
+                {"bool": {"must": [{"term": {"type": "option"}}, {"term": {"option_name": name}}]}},
+                1,
+                0,
+                source=OPTION_FIELDS,
+            )
+            for name in names
+        ]
+        results = NixOSSearch._es_msearch(index, bodies)
+        return {
+            name: Option.model_validate(_option_source(hits[0])) if hits else None
+            for name, (hits, _) in zip(names, results, strict=True)
+        }
 
     @staticmethod
     def get_option_children(prefix: str, channel: str) -> list[Option]:
@@ -240,8 +450,15 @@ class NixOSSearch:
                 ]
             }
         }
-        hits = NixOSSearch._es_query_all(index, query)
-        return [Option.model_validate(hit.get("_source", {})) for hit in hits]
+        hits = NixOSSearch._es_query_all(index, query, source=OPTION_FIELDS, concurrent=True)
+        return [Option.model_validate(_option_source(hit)) for hit in hits]
+
+    @staticmethod
+    def list_options(channel: str) -> list[Option]:
+        """Get every option of a channel."""
+        index = NixOSSearch._get_channel_index(channel)
+        hits = NixOSSearch._es_query_all(index, {"term": {"type": "option"}}, source=OPTION_FIELDS)
+        return [Option.model_validate(_option_source(hit)) for hit in hits]
 
     @staticmethod
     def list_channels() -> list[Channel]:
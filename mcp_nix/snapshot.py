@@ -0,0 +1,442 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Offline snapshots: every dataset mcp-nix uses, in a single file.
+
+A snapshot is a SQLite database holding the HTTP responses the backends parse
+(search.nixos.org config, Home Manager, NüschtOS, nix-nomad, Noogle) and the
+option and package documents of chosen NixOS channels. With a snapshot
+activated, responses are replayed from it instead of the network or the disk
+cache, and Elasticsearch queries are evaluated against its documents.
+"""
+
+import contextlib
+import fnmatch
+import json
+import os
+import re
+import sqlite3
+import string
+import threading
+import time
+import zlib
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from requests.structures import CaseInsensitiveDict
+
+from .cache import APIError, CachedResponse, set_recorder, set_replayer
+
+SNAPSHOT_VERSION = 1
+NOOGLE_RESULT_LIMIT = 10_000  # Results per Noogle search when collecting functions
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE responses (
+    url TEXT PRIMARY KEY,
+    status_code INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    final_url TEXT NOT NULL,
+    content BLOB NOT NULL
+);
+CREATE TABLE documents (
+    idx TEXT NOT NULL,
+    type TEXT NOT NULL,
+    source BLOB NOT NULL,
+    PRIMARY KEY (idx, type)
+);
+"""
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_active: "Snapshot | None" = None
+
+
+class SnapshotError(APIError):
+    """Raised when a snapshot can't be read, or doesn't hold the requested data."""
+
+
+# =============================================================================
+# Query evaluation
+# =============================================================================
+
+
+def _field_spec(body: dict[str, Any], key: str) -> tuple[str, Any, float]:
+    """Split a leaf query body into (field, value, boost)."""
+    ((field, spec),) = body.items()
+    if isinstance(spec, dict):
+        return field, spec.get(key), float(spec.get("boost", 1.0))
+    return field, spec, 1.0
+
+
+def _values(doc: dict[str, Any], field: str) -> list[Any]:
+    value = doc.get(field)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _tokens(text: Any) -> set[str]:
+    return set(_TOKEN_RE.findall(str(text).lower()))
+
+
+def _score(query: dict[str, Any], doc: dict[str, Any]) -> float | None:
+    """Score a document against the query subset mcp-nix sends, or None if it doesn't match.
+
+    Scores only approximate Elasticsearch's relevance: term-like clauses count
+    their boost, match clauses the share of query words found in the field.
+    """
+    ((kind, body),) = query.items()
+
+    if kind == "bool":
+        required = body.get("must", []) + body.get("filter", [])
+        score = 0.0
+        for clause in required:
+            clause_score = _score(clause, doc)
+            if clause_score is None:
+                return None
+            score += clause_score
+        if any(_score(clause, doc) is not None for clause in body.get("must_not", [])):
+            return None
+        should = [s for clause in body.get("should", []) if (s := _score(clause, doc)) is not None]
+        if len(should) < int(body.get("minimum_should_match", 0 if required else 1)):
+            return None
+        return score + sum(should)
+
+    if kind == "match":
+        field, text, boost = _field_spec(body, "query")
+        wanted = _tokens(text)
+        if not wanted:
+            return None
+        found = set().union(*(_tokens(value) for value in _values(doc, field)))
+        matched = len(wanted & found)
+        return boost * matched / len(wanted) if matched else None
+
+    field, pattern, boost = _field_spec(body, "value")
+    values = _values(doc, field)
+    if kind == "term":
+        matched = pattern in values
+    elif kind == "prefix":
+        matched = any(str(value).startswith(pattern) for value in values)
+    elif kind == "wildcard":
+        fold = str.lower if isinstance(body[field], dict) and body[field].get("case_insensitive") else str
+        matched = any(fnmatch.fnmatchcase(fold(str(value)), fold(pattern)) for value in values)
+    else:
+        raise SnapshotError(f"Query not supported in offline mode: {kind}")
+    return boost if matched else None
+
+
+def _required_terms(query: dict[str, Any]) -> dict[str, Any]:
+    """Get the field values a bool query requires through term clauses."""
+    body = query.get("bool")
+    if body is None:
+        return {}
+    terms = {}
+    for clause in body.get("must", []) + body.get("filter", []):
+        if "term" in clause:
+            field, value, _ = _field_spec(clause["term"], "value")
+            terms[field] = value
+    return terms
+
+
+class _Documents:
+    """Documents of one type in one index, with lookups by exact field value built on demand."""
+
+    def __init__(self, docs: list[dict[str, Any]]):
+        self.docs = docs
+        self._by_value: dict[str, dict[Any, list[dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, field: str, value: Any) -> list[dict[str, Any]]:
+        with self._lock:
+            table = self._by_value.get(field)
+            if table is None:
+                table = {}
+                for doc in self.docs:
+                    for v in _values(doc, field):
+                        with contextlib.suppress(TypeError):
+                            table.setdefault(v, []).append(doc)
+                self._by_value[field] = table
+        return table.get(value, [])
+
+    def candidates(self, terms: dict[str, Any]) -> list[dict[str, Any]]:
+        """Narrow down the documents that can match, using one required term."""
+        for field, value in terms.items():
+            if field != "type":
+                return self.lookup(field, value)
+        return self.docs
+
+
+# =============================================================================
+# Reading
+# =============================================================================
+
+
+class Snapshot:
+    """A snapshot file opened for reading."""
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise SnapshotError(f"Snapshot not found: {path}")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._documents: dict[tuple[str, str], _Documents | None] = {}
+        try:
+            self.meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.DatabaseError as e:
+            raise SnapshotError(f"Not an mcp-nix snapshot: {path}") from e
+        version = int(self.meta.get("version", 0))
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}, expected {SNAPSHOT_VERSION}: {path}")
+
+    @property
+    def channels(self) -> list[str]:
+        """NixOS channels whose documents are in the snapshot."""
+        return json.loads(self.meta.get("channels", "[]"))
+
+    def chunk_count(self, instance: str) -> int | None:
+        """Number of option chunks recorded for a NüschtOS instance, or None if unknown."""
+        return json.loads(self.meta.get("nuschtos_chunks", "{}")).get(instance)
+
+    def response(self, url: str) -> CachedResponse:
+        """Get the recorded response for a URL."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status_code, headers, final_url, content FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            raise SnapshotError(f"Not available in the offline snapshot: {url}")
+        status_code, headers, final_url, content = row
+        return CachedResponse(
+            content=zlib.decompress(content),
+            status_code=status_code,
+            headers=CaseInsensitiveDict(json.loads(headers)),
+            url=final_url,
+        )
+
+    def _get_documents(self, index: str, type_: str) -> _Documents | None:
+        key = (index, type_)
+        with self._lock:
+            if key not in self._documents:
+                row = self._conn.execute(
+                    "SELECT source FROM documents WHERE idx = ? AND type = ?", (index, type_)
+                ).fetchone()
+                self._documents[key] = _Documents(json.loads(zlib.decompress(row[0]))) if row else None
+            return self._documents[key]
+
+    def search(
+        self,
+        index: str,
+        query: dict[str, Any],
+        size: int = 20,
+        from_: int = 0,
+        *,
+        sort: list[dict[str, Any]] | None = None,
+        search_after: list[Any] | None = None,
+    ) -> tuple[list[dict[str, Any]], int]:
+        """Evaluate an Elasticsearch query against the snapshot. Returns (hits, total_count) like `_es_query`.
+
+        sort supports a single ascending field, as used with search_after.
+        """
+        terms = _required_terms(query)
+        types = [terms["type"]] if "type" in terms else ["option", "package"]
+        document_sets = [docs for type_ in types if (docs := self._get_documents(index, type_)) is not None]
+        if not document_sets:
+            raise SnapshotError(f"Index {index} is not in the offline snapshot (channels: {', '.join(self.channels)})")
+
+        scored = []
+        for docs in document_sets:
+            for doc in docs.candidates(terms):
+                score = _score(query, doc)
+                if score is not None:
+                    scored.append((score, len(scored), doc))
+        total = len(scored)
+        if sort:
+            ((field, _),) = sort[0].items()
+            scored.sort(key=lambda item: str(item[2].get(field, "")))
+            if search_after is not None:
+                scored = [item for item in scored if str(item[2].get(field, "")) > search_after[0]]
+            page = scored[from_ : from_ + size]
+            return [{"_source": doc, "_score": score, "sort": [doc.get(field, "")]} for score, _, doc in page], total
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        hits = [{"_source": doc, "_score": score} for score, _, doc in scored[from_ : from_ + size]]
+        return hits, total
+
+
+def activate(path: str) -> Snapshot:
+    """Serve every request from a snapshot instead of the network."""
+    global _active
+    _active = Snapshot(path)
+    set_replayer(_active.response)
+    return _active
+
+
+def get_active() -> Snapshot | None:
+    """Get the snapshot requests are served from, if offline."""
+    return _active
+
+
+# =============================================================================
+# Writing
+# =============================================================================
+
+
+def _write(
+    path: str,
+    responses: dict[str, CachedResponse],
+    documents: dict[tuple[str, str], list[dict[str, Any]]],
+    meta: dict[str, str],
+) -> None:
+    """Write a snapshot file, replacing any existing one only once complete."""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            conn.executescript(_SCHEMA)
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [("version", str(SNAPSHOT_VERSION)), *meta.items()],
+            )
+            conn.executemany(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?)",
+                (
+                    (url, r.status_code, json.dumps(dict(r.headers)), r.url, zlib.compress(r.content, 9))
+                    for url, r in responses.items()
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO documents VALUES (?, ?, ?)",
+                (
+                    (index, type_, zlib.compress(json.dumps(docs).encode(), 9))
+                    for (index, type_), docs in documents.items()
+                ),
+            )
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+def _export_homemanager() -> None:
+    from .homemanager import _get_options, get_config
+
+    for release in get_config().releases:
+        _get_options(release["value"])
+
+
+def _export_nuschtos() -> dict[str, int]:
+    """Record every instance's option chunks. Returns the number of chunks per instance."""
+    from .nuschtos import INSTANCES, _get_chunk, _get_index
+
+    counts = {}
+    for instance in INSTANCES:
+        index_data = _get_index(instance)
+        chunk = 0
+        while True:
+            try:
+                _get_chunk(instance, chunk, index_data)
+            except APIError:
+                break  # Past the last chunk
+            chunk += 1
+        counts[instance] = chunk
+    return counts
+
+
+def _export_noogle(pages: bool, workers: int) -> int:
+    """Record Noogle's search index and result fragments, and optionally every function page."""
+    from .noogle import _fetch_noogle_function, _get_pagefind
+
+    pagefind = _get_pagefind()
+    paths: set[str] = set()
+    # Pagefind matches word prefixes, so single characters reach every indexed word
+    for prefix in string.ascii_lowercase + string.digits:
+        results, _ = pagefind.search(prefix, NOOGLE_RESULT_LIMIT)
+        paths.update(func.path for func in results if func.path)
+
+    if pages:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(_fetch_noogle_function, path) for path in sorted(paths)]:
+                with contextlib.suppress(APIError):
+                    future.result()
+    return len(paths)
+
+
+def _export_documents(channels: list[str], packages: bool) -> dict[tuple[str, str], list[dict[str, Any]]]:
+    from .search import OPTION_FIELDS, PACKAGE_FIELDS, NixOSSearch
+
+    # (type, sort field, fields kept): what the models read, plus what offline queries filter and sort on
+    types = [("option", "option_name", [*OPTION_FIELDS, "type"])]
+    if packages:
+        types.append(("package", "package_attr_name", [*PACKAGE_FIELDS, "type", "package_attr_name"]))
+
+    documents = {}
+    for channel in channels:
+        index = NixOSSearch._get_channel_index(channel)
+        for type_, sort_field, source in types:
+            hits = NixOSSearch._es_query_all(index, {"term": {"type": type_}}, sort_field=sort_field, source=source)
+            documents[(index, type_)] = [hit.get("_source", {}) for hit in hits]
+    return documents
+
+
+def export(
+    path: str,
+    *,
+    channels: list[str] | None = None,
+    packages: bool = True,
+    noogle_pages: bool = False,
+    workers: int = 8,
+    on_progress: Callable[[str], None] | None = None,
+) -> None:
+    """Fetch every dataset and write it to a snapshot file.
+
+    channels defaults to the default NixOS channel. Noogle function pages are only
+    included with noogle_pages, as there is one per function.
+    """
+    from .search import get_config
+    from .warm import warm
+
+    if get_active() is not None:
+        raise SnapshotError("Can't export a snapshot while offline")
+
+    progress = on_progress or (lambda message: None)
+    responses: dict[str, CachedResponse] = {}
+    lock = threading.Lock()
+
+    def record(url: str, response: CachedResponse) -> None:
+        with lock:
+            responses[url] = response
+
+    def step(name: str, fn: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except APIError as e:
+            raise SnapshotError(f"Failed to export {name}: {e}") from e
+        progress(f"{name:<40} {time.perf_counter() - start:>7.2f}s")
+        return result
+
+    set_recorder(record)
+    try:
+        results = warm(workers=workers, on_result=lambda result: progress(str(result)))
+        failed = [result.artifact for result in results if result.error]
+        if failed:
+            raise SnapshotError(f"Failed to export {', '.join(failed)}")
+
+        step("homemanager: all releases", _export_homemanager)
+        chunk_counts = step("nuschtos: option chunks", _export_nuschtos)
+        step("noogle: search index", lambda: _export_noogle(noogle_pages, workers))
+        selected = channels or [get_config().default_channel]
+        documents = step("nixos: documents", lambda: _export_documents(selected, packages))
+    finally:
+        set_recorder(None)
+
+    meta = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "channels": json.dumps(selected),
+        # Offline, a missing chunk isn't a 404, so the end of the chunks is recorded
+        "nuschtos_chunks": json.dumps(chunk_counts),
+    }
+    _write(path, responses, documents, meta)
+    progress(f"Wrote {len(responses)} responses and {sum(map(len, documents.values()))} documents to {path}")
@@ -1,13 +1,28 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Source code fetching and caching for declarations."""
 
-from dataclasses import dataclass
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
-from .cache import get_cache
+from . import tarball
+from .cache import DEFAULT_EXPIRE, get_cache
 from .search import APIError
 
 _cache = get_cache("sources")
 
+# Line counts are looked up without waiting on downloads; missing ones are fetched here
+_prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="mcp-nix-sources")
+_prefetching: set[str] = set()
+_prefetch_lock = threading.Lock()
+
+CHANNELS_URL = "https://channels.nixos.org"
+NIXPKGS_RAW_URL = "https://raw.githubusercontent.com/NixOS/nixpkgs"
+
+_NIXPKGS_BLOB_RE = re.compile(r"^https://github\.com/NixOS/nixpkgs/blob/([^/]+)/(.+)$")
+_COMMIT_RE = re.compile(r"^[0-9a-f]{40}$")
+
 
 def to_raw_url(url: str) -> str:
     """Convert a GitHub or GitLab blob URL to a raw URL."""
@@ -22,6 +37,60 @@ def to_raw_url(url: str) -> str:
     return url
 
 
+def _line_offsets(content: str) -> list[int]:
+    """Get the character offset at which each line of content starts."""
+    if not content:
+        return []
+    offsets = [0]
+    pos = content.find("\n")
+    while pos != -1:
+        offsets.append(pos + 1)
+        pos = content.find("\n", pos + 1)
+    return offsets
+
+
+def get_channel_revision(branch: str) -> str:
+    """Get the nixpkgs commit a channel branch (e.g. "nixos-unstable") currently points to."""
+
+    def parse_revision(r) -> str:
+        revision = r.text.strip()
+        if not _COMMIT_RE.match(revision):
+            raise APIError(f"Unexpected revision for channel '{branch}': {revision[:60]}")
+        return revision
+
+    return _cache.request(f"{CHANNELS_URL}/{branch}/git-revision", parse_revision)
+
+
+def _resolve_nixpkgs(url: str) -> tuple[str, str] | None:
+    """Get (commit, path) for a nixpkgs blob URL, resolving channel branches to their commit."""
+    match = _NIXPKGS_BLOB_RE.match(url)
+    if not match:
+        return None
+
+    ref, path = match.groups()
+    if not _COMMIT_RE.match(ref):
+        try:
+            ref = get_channel_revision(ref)
+        except APIError:
+            return None
+    return ref, path
+
+
+def _pin_url(url: str) -> tuple[str, float | None]:
+    """Get the raw URL to fetch for a source URL, and how long to cache it.
+
+    nixpkgs channel URLs are resolved to the channel's current commit. Files at a
+    commit never change, so they are cached forever, and every option declared in
+    the same module shares one copy until the channel moves.
+    """
+    resolved = _resolve_nixpkgs(url)
+    if resolved is None:
+        return to_raw_url(url), DEFAULT_EXPIRE
+
+    rev, path = resolved
+    return f"{NIXPKGS_RAW_URL}/{rev}/{path}", None
+
+
 @dataclass
 class CachedSource:
     """Cached source file with metadata."""
@@ -29,33 +98,105 @@ class CachedSource:
     content: str
     line_count: int
     url: str
+    line_offsets: list[int] = field(default_factory=list)
+
+    def lines(self, start: int, end: int) -> str:
+        """Get lines start..end (1-based, inclusive, clamped to the file) via the offset index."""
+        start = max(start, 1)
+        end = min(end, self.line_count)
+        if start > end:
+            return ""
+        begin = self.line_offsets[start - 1]
+        if end < self.line_count:
+            return self.content[begin : self.line_offsets[end] - 1]
+        return self.content[begin:]
 
 
 def fetch_source(url: str) -> CachedSource:
-    """Fetch source code from URL, using cache if available."""
+    """Fetch source code from URL, using the local nixpkgs mirror or cache if available."""
     if not url:
         raise APIError("No URL provided")
 
-    raw_url = to_raw_url(url)
+    source = _read_local(url)
+    if source is None:
+        source = _fetch_remote(url)
+    return source
+
+
+def _to_cached_source(content: str, url: str) -> CachedSource:
+    offsets = _line_offsets(content)
+    return CachedSource(content=content, line_count=len(offsets), url=url, line_offsets=offsets)
+
+
+def _read_local(url: str) -> CachedSource | None:
+    """Read a nixpkgs source from the local tarball mirror, if enabled and available."""
+    if not tarball.is_enabled():
+        return None
+    resolved = _resolve_nixpkgs(url)
+    if resolved is None:
+        return None
+    content = tarball.read_file(*resolved)
+    if content is None:
+        return None
+    source = _to_cached_source(content, url)
+    _record_line_count(source)
+    return source
+
+
+def _fetch_remote(url: str) -> CachedSource:
+    raw_url, expire = _pin_url(url)
 
     def parse_source(r) -> CachedSource:
         if "text/plain" not in r.content_type:
             raise APIError(f"Unexpected content type '{r.content_type}' from {raw_url}")
+        source = _to_cached_source(r.text, url)
+        _record_line_count(source)
+        return source
 
-        content = r.text
-        line_count = content.count("\n") + 1 if content else 0
-        return CachedSource(content=content, line_count=line_count, url=url)
+    return _cache.request(raw_url, parse_source, expire=expire)
 
-    return _cache.request(raw_url, parse_source)
+
+def _line_count_key(url: str) -> tuple[str, str]:
+    return ("line-count", url)
+
+
+def _record_line_count(source: CachedSource) -> None:
+    """Record the line count of a freshly read source, unless it is already known."""
+    key = _line_count_key(source.url)
+    if _cache.get(key) != source.line_count:
+        _cache.set(key, source.line_count, expire=DEFAULT_EXPIRE)
+
+
+def _prefetch(url: str) -> None:
+    """Fetch a source in the background, recording its line count."""
+    with _prefetch_lock:
+        if url in _prefetching:
+            return
+        _prefetching.add(url)
+
+    def run() -> None:
+        try:
+            # The source may still be cached after its recorded count expired
+            _record_line_count(fetch_source(url))
+        except APIError:
+            pass
+        finally:
+            with _prefetch_lock:
+                _prefetching.discard(url)
+
+    _prefetch_executor.submit(run)
 
 
 def get_line_count(url: str) -> int | None:
-    """Get line count for a source URL, fetching and caching if needed."""
+    """Get line count for a source URL without waiting on a download.
+
+    Counts are recorded whenever a source is fetched. If the source hasn't been
+    fetched yet, this starts fetching it in the background and returns None.
+    """
     if not url:
         return None
 
-    try:
-        source = fetch_source(url)
-        return source.line_count
-    except APIError:
-        return None
+    line_count = _cache.get(_line_count_key(url))
+    if line_count is None:
+        _prefetch(url)
+    return line_count
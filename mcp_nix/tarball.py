@@ -0,0 +1,185 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Local nixpkgs source mirror backed by per-commit tarballs.
+
+When enabled, the nixpkgs tarball for a commit is downloaded once in the
+background, decompressed to disk and indexed by tar member offsets. Source
+reads for that commit are then served from local disk instead of GitHub.
+"""
+
+import contextlib
+import gzip
+import json
+import os
+import shutil
+import tarfile
+import threading
+from dataclasses import dataclass
+
+import requests
+from platformdirs import user_cache_dir
+
+TARBALL_URL = "https://github.com/NixOS/nixpkgs/archive"
+MIRROR_DIR = f"{user_cache_dir('mcp-nix')}/nixpkgs"
+MAX_TARBALLS = 3  # Tarballs kept on disk, least recently used are removed
+DOWNLOAD_TIMEOUT = 60
+
+_enabled = False
+_download_enabled = True
+_tarballs: dict[str, "Tarball"] = {}
+_downloading: set[str] = set()
+_lock = threading.Lock()
+
+
+@dataclass
+class Tarball:
+    """Uncompressed nixpkgs tarball with an index of its files."""
+
+    path: str
+    members: dict[str, tuple[int, int]]  # file path -> (data offset, size)
+
+    def read(self, file_path: str) -> bytes | None:
+        """Read a file by its path inside nixpkgs, or None if it isn't in the tarball or was pruned."""
+        member = self.members.get(file_path)
+        if member is None:
+            return None
+        offset, size = member
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                return f.read(size)
+        except FileNotFoundError:
+            return None
+
+
+def enable(*, download: bool = True) -> None:
+    """Serve nixpkgs source reads from local tarballs, downloading missing ones unless download is False."""
+    global _enabled, _download_enabled
+    _enabled = True
+    _download_enabled = download
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _paths(rev: str) -> tuple[str, str]:
+    return f"{MIRROR_DIR}/{rev}.tar", f"{MIRROR_DIR}/{rev}.json"
+
+
+def _build_index(tar_path: str) -> dict[str, tuple[int, int]]:
+    """Index regular files by path, dropping the tarball's top-level directory."""
+    members = {}
+    with tarfile.open(tar_path) as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            _, _, file_path = member.name.partition("/")
+            members[file_path] = (member.offset_data, member.size)
+    return members
+
+
+def _prune() -> None:
+    """Remove the least recently used tarballs beyond MAX_TARBALLS."""
+    tars = sorted(
+        (entry for entry in os.scandir(MIRROR_DIR) if entry.name.endswith(".tar")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in tars[MAX_TARBALLS:]:
+        rev = entry.name.removesuffix(".tar")
+        with _lock:
+            _tarballs.pop(rev, None)
+        for path in _paths(rev):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+
+def _download(rev: str) -> None:
+    """Download, decompress and index the tarball for a commit."""
+    tar_path, index_path = _paths(rev)
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    tmp_path = f"{tar_path}.{threading.get_ident()}.tmp"
+    try:
+        with requests.get(f"{TARBALL_URL}/{rev}.tar.gz", stream=True, timeout=DOWNLOAD_TIMEOUT) as resp:
+            resp.raise_for_status()
+            with gzip.GzipFile(fileobj=resp.raw) as gz, open(tmp_path, "wb") as out:
+                shutil.copyfileobj(gz, out, length=1024 * 1024)
+
+        members = _build_index(tmp_path)
+        with open(f"{index_path}.tmp", "w") as f:
+            json.dump(members, f)
+        os.replace(tmp_path, tar_path)
+        os.replace(f"{index_path}.tmp", index_path)
+
+        with _lock:
+            _tarballs[rev] = Tarball(path=tar_path, members=members)
+        _prune()
+    except (requests.RequestException, OSError, EOFError, tarfile.TarError):
+        # Reads keep going to the network; the next read retries the download
+        pass
+    finally:
+        for path in (tmp_path, f"{index_path}.tmp"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        with _lock:
+            _downloading.discard(rev)
+
+
+def _load(rev: str) -> Tarball | None:
+    """Load an already downloaded tarball from disk."""
+    tar_path, index_path = _paths(rev)
+    try:
+        with open(index_path) as f:
+            members = {path: (offset, size) for path, (offset, size) in json.load(f).items()}
+    except (FileNotFoundError, ValueError):
+        return None
+    if not _touch(tar_path):
+        return None
+    return Tarball(path=tar_path, members=members)
+
+
+def _touch(tar_path: str) -> bool:
+    """Mark a tarball as recently used for pruning. Returns False if it no longer exists."""
+    try:
+        os.utime(tar_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def get_tarball(rev: str) -> Tarball | None:
+    """Get the local tarball for a commit, or None while it isn't available yet.
+
+    A missing tarball is downloaded in a background thread, so callers never wait on it.
+    When downloads are disabled, only tarballs already on disk are used.
+    """
+    with _lock:
+        tarball = _tarballs.get(rev)
+        if rev in _downloading:
+            return None
+    if tarball is not None:
+        if _touch(tarball.path):
+            return tarball
+        with _lock:
+            _tarballs.pop(rev, None)
+
+    tarball = _load(rev)
+    with _lock:
+        if tarball is not None:
+            _tarballs[rev] = tarball
+            return tarball
+        if rev in _downloading or not _download_enabled:
+            return None
+        _downloading.add(rev)
+
+    threading.Thread(target=_download, args=(rev,), name=f"mcp-nix-tarball-{rev[:12]}", daemon=True).start()
+    return None
+
+
+def read_file(rev: str, file_path: str) -> str | None:
+    """Read a nixpkgs file at a commit from the local mirror, or None if it can't be served locally."""
+    tarball = get_tarball(rev)
+    if tarball is None:
+        return None
+    data = tarball.read(file_path)
+    return data.decode("utf-8") if data is not None else None
@@ -1,14 +1,25 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """MCP tools for Nixpkgs, NixOS and Home Manager."""
 
+from concurrent.futures import ThreadPoolExecutor
+
 from . import mcp
+from .models import Package
 from .nixhub import NixhubSearch, PackageNotFoundError, VersionNotFoundError
 from .noogle import FunctionNotFoundError, NoogleSearch
-from .options import InvalidProjectError, get_backend
+from .options import (
+    InvalidProjectError,
+    OptionsBackend,
+    UnifiedOption,
+    get_backend,
+    resolve_projects,
+    search_all,
+)
 from .search import APIError, InvalidChannelError, NixOSSearch
-from .sources import fetch_source, get_line_count
+from .sources import CachedSource, fetch_source, get_line_count
 
 _SEARCH_LIMIT = 20
+_BATCH_WORKERS = 8  # Sources fetched concurrently for batch reads
 
 
 def _position_to_github_url(position: str, channel: str) -> str | None:
@@ -24,6 +35,21 @@ def _position_to_github_url(position: str, channel: str) -> str | None:
     return f"https://github.com/NixOS/nixpkgs/blob/{branch}/{file_path}"
 
 
+def _format_source(url: str, source: CachedSource, start_line: int | None, end_line: int | None) -> str:
+    """Format fetched source code, optionally restricted to a line range."""
+    if start_line is None and end_line is None:
+        return f"Reference: {url}\nSource: {source.line_count} lines\n\n{source.content}"
+
+    if start_line is not None and end_line is not None and end_line < start_line:
+        return f"Error: end_line ({end_line}) is before start_line ({start_line})"
+
+    start = 1 if start_line is None else max(start_line, 1)
+    end = source.line_count if end_line is None else min(end_line, source.line_count)
+    if start > end:
+        return f"Error: Invalid line range {start_line}-{end_line}, {url} has {source.line_count} lines"
+    return f"Reference: {url}\nSource: {source.line_count} lines, showing {start}-{end}\n\n{source.lines(start, end)}"
+
+
 def _format_error(e: Exception) -> str:
     """Format an exception for user display."""
     if isinstance(e, InvalidChannelError):
@@ -73,22 +99,10 @@ async def search_nixpkgs(query: str, channel: str = "unstable") -> str:
     return header + "\n\n".join(pkg.format_short() for pkg in result.items)
 
 
-@mcp.tool()
-async def read_derivation(name: str, channel: str = "unstable") -> str:
-    """Read the Nix source code for a package derivation.
-
-    Fetches and returns the .nix file that defines a package. Use search_nixpkgs
-    first if you don't know the exact package name.
-
-    Args:
-        name: Exact package name (e.g., "git", "firefox")
-        channel: NixOS channel - "unstable" or version like "24.11", "25.05"
-    """
-    try:
-        pkg = NixOSSearch.get_package(name, channel)
-    except APIError as e:
-        return _format_error(e)
-
+def _read_package_source(
+    name: str, pkg: Package | None, channel: str, start_line: int | None, end_line: int | None
+) -> str:
+    """Read a package's derivation source, or describe why it can't be read."""
     if pkg is None:
         return f"Error: Package '{name}' not found"
 
@@ -104,7 +118,38 @@ async def read_derivation(name: str, channel: str = "unstable") -> str:
     except APIError as e:
         return _format_error(e)
 
-    return f"Reference: {url}\nSource: {source.line_count} lines\n\n{source.content}"
+    return _format_source(url, source, start_line, end_line)
+
+
+@mcp.tool()
+async def read_derivation(
+    name: str | list[str], channel: str = "unstable", start_line: int | None = None, end_line: int | None = None
+) -> str:
+    """Read the Nix source code for a package derivation.
+
+    Fetches and returns the .nix file that defines a package. Use search_nixpkgs
+    first if you don't know the exact package name. For large files, pass
+    start_line/end_line to read only part of it. Pass a list of names to read
+    several derivations at once.
+
+    Args:
+        name: Exact package name (e.g., "git", "firefox"), or a list of names
+        channel: NixOS channel - "unstable" or version like "24.11", "25.05"
+        start_line: First line to return (1-based). Omit to start at the beginning.
+        end_line: Last line to return (inclusive). Omit to read to the end.
+    """
+    names = [name] if isinstance(name, str) else name
+    if not names:
+        return "Error: No package names given"
+
+    try:
+        packages = NixOSSearch.get_packages(names, channel)
+    except APIError as e:
+        return _format_error(e)
+
+    with ThreadPoolExecutor(max_workers=_BATCH_WORKERS) as executor:
+        sections = executor.map(lambda n: _read_package_source(n, packages[n], channel, start_line, end_line), packages)
+        return "\n\n".join(sections)
 
 
 # =============================================================================
@@ -112,21 +157,51 @@ async def read_derivation(name: str, channel: str = "unstable") -> str:
 # =============================================================================
 
 
+def _search_options_federated(project: str, query: str, version: str) -> str:
+    """Search several projects at once, noting the ones that didn't answer."""
+    try:
+        projects = resolve_projects(project)
+    except InvalidProjectError as e:
+        return _format_error(e)
+
+    result = search_all(query, _SEARCH_LIMIT, projects, version)
+
+    header = ""
+    if result.failed:
+        reasons = ", ".join(f"{name} ({reason})" for name, reason in result.failed.items())
+        header = f"Note: No results from {reasons}\n\n"
+
+    if not result.items:
+        return header + f"No options found matching '{query}'"
+
+    if result.total > len(result.items):
+        header += f"Showing {len(result.items)} of {result.total} options:\n"
+    else:
+        header += f"Found {len(result.items)} options:\n"
+
+    return header + "\n\n".join(opt.format_short(with_project=True) for opt in result.items)
+
+
 @mcp.tool()
 async def search_options(project: str, query: str, version: str = "") -> str:
     """Search configuration options for a Nix project.
 
     Searches NixOS, Home Manager, NixVim, nix-darwin, impermanence, MicroVM, or nix-nomad
-    options by name or description.
+    options by name or description. Use project="all" (or a comma-separated list) when
+    you don't know which project an option belongs to.
 
     Args:
         project: Project to search - one of: nixos, homemanager, nixvim, nix-darwin,
-                 impermanence, microvm, nix-nomad
+                 impermanence, microvm, nix-nomad. Or "all", or a comma-separated list
+                 like "nixos,homemanager".
         query: Search term (e.g., "nginx", "programs.git", "colorscheme")
         version: Version/channel to search. For nixos: "unstable", "24.11", "25.05".
                  For homemanager: "unstable", "24.11", "25.05". Other projects only
                  support "latest". If omitted, uses the default version.
     """
+    if project == "all" or "," in project:
+        return _search_options_federated(project, query, version)
+
     try:
         backend = get_backend(project)
     except InvalidProjectError as e:
@@ -181,17 +256,47 @@ async def list_versions(project: str) -> str:
     return header + "\n\n".join(str(v) for v in versions)
 
 
+def _format_option_details(backend: OptionsBackend, name: str, opt: UnifiedOption | None, version: str) -> str:
+    """Format an option's details, or list its children if it is a prefix."""
+    if opt is not None:
+        result = str(opt)
+        if opt.declaration_url:
+            line_count = get_line_count(opt.declaration_url)
+            if line_count and backend.supports_declaration_read():
+                result += (
+                    f"\nReference: {opt.declaration_url} ({line_count} lines, use read_option_declaration to read)"
+                )
+            elif line_count:
+                result += f"\nReference: {opt.declaration_url} ({line_count} lines)"
+            elif backend.supports_declaration_read():
+                # Line count not known yet, it is being fetched in the background
+                result += f"\nReference: {opt.declaration_url} (use read_option_declaration to read)"
+            else:
+                result += f"\nReference: {opt.declaration_url}"
+        return result
+
+    # No exact match - get children
+    children = backend.get_option_children(name, version)
+    if children:
+        child_header = f"'{name}' has {len(children)} child options:\n"
+        return child_header + "\n\n".join(o.format_short() for o in children)
+
+    return f"No option or children found for '{name}'"
+
+
 @mcp.tool()
-async def show_option_details(project: str, name: str, version: str = "") -> str:
+async def show_option_details(project: str, name: str | list[str], version: str = "") -> str:
     """Get details for an option, or list all children if given a prefix.
 
     For leaf options like "services.nginx.enable", returns type, default, and description.
     For prefixes like "services.nginx", lists ALL child options exhaustively.
+    Pass a list of names to look up several options at once.
 
     Args:
         project: Project name - one of: nixos, homemanager, nixvim, nix-darwin,
                  impermanence, microvm, nix-nomad
-        name: Option path or prefix (e.g., "services.nginx.enable" or "programs.git")
+        name: Option path or prefix (e.g., "services.nginx.enable" or "programs.git"),
+              or a list of them
         version: Version to use. If omitted, uses the default version.
     """
     try:
@@ -199,6 +304,10 @@ async def show_option_details(project: str, name: str, version: str = "") -> str
     except InvalidProjectError as e:
         return _format_error(e)
 
+    names = [name] if isinstance(name, str) else name
+    if not names:
+        return "Error: No option names given"
+
     effective_version = version or backend.get_default_version()
     effective_version, warning = backend.validate_version(effective_version)
 
@@ -207,39 +316,24 @@ async def show_option_details(project: str, name: str, version: str = "") -> str
         header = f"Note: {warning}\n\n"
 
     try:
-        # Try exact match first
-        opt = backend.get_option(name, effective_version)
-        if opt is not None:
-            result = str(opt)
-            if opt.declaration_url:
-                line_count = get_line_count(opt.declaration_url)
-                if line_count and backend.supports_declaration_read():
-                    result += (
-                        f"\nReference: {opt.declaration_url} ({line_count} lines, use read_option_declaration to read)"
-                    )
-                elif line_count:
-                    result += f"\nReference: {opt.declaration_url} ({line_count} lines)"
-                else:
-                    result += f"\nReference: {opt.declaration_url}"
-            return header + result
-
-        # No exact match - get children
-        children = backend.get_option_children(name, effective_version)
-        if children:
-            child_header = f"'{name}' has {len(children)} child options:\n"
-            return header + child_header + "\n\n".join(o.format_short() for o in children)
-
-        return header + f"No option or children found for '{name}'"
+        # Try exact matches first, in one round trip
+        options = backend.get_options(names, effective_version)
+        sections = [_format_option_details(backend, n, opt, effective_version) for n, opt in options.items()]
     except APIError as e:
         return _format_error(e)
 
+    return header + "\n\n".join(sections)
+
 
 @mcp.tool()
-async def read_option_declaration(project: str, name: str, version: str = "") -> str:
+async def read_option_declaration(
+    project: str, name: str, version: str = "", start_line: int | None = None, end_line: int | None = None
+) -> str:
     """Read the Nix source code for an option declaration.
 
     Fetches and returns the module file that declares an option.
     Use search_options or show_option_details first to find the option name.
+    For large modules, pass start_line/end_line to read only part of the file.
 
     Note: nix-nomad options don't have readable declarations as they are
     auto-generated from Nomad HCL specifications.
@@ -249,6 +343,8 @@ async def read_option_declaration(project: str, name: str, version: str = "") ->
                  impermanence, microvm (nix-nomad not supported)
         name: Exact option path (e.g., "services.nginx.enable")
         version: Version to use. If omitted, uses the default version.
+        start_line: First line to return (1-based). Omit to start at the beginning.
+        end_line: Last line to return (inclusive). Omit to read to the end.
     """
     try:
         backend = get_backend(project)
@@ -285,7 +381,7 @@ async def read_option_declaration(project: str, name: str, version: str = "") ->
     except APIError as e:
         return _format_error(e)
 
-    return header + f"Reference: {url}\nSource: {source.line_count} lines\n\n{source.content}"
+    return header + _format_source(url, source, start_line, end_line)
 
 
 # =============================================================================
@@ -298,12 +394,14 @@ async def find_nixpkgs_commit_with_package_version(name: str, version: str) -> s
     """Get the nixpkgs commit hash for a specific package version.
 
     Returns the commit hash that can be used to pin nixpkgs to get
-    this exact package version. If the version is not found, returns
-    available versions for the package.
+    this package version. A version constraint resolves to the highest
+    matching version. If no version matches, returns the available
+    versions for the package, nearest first.
 
     Args:
         name: Package name (e.g., "nodejs", "python")
-        version: Exact version string (e.g., "20.11.0", "3.12.1")
+        version: Exact version (e.g., "20.11.0"), a prefix (e.g., "20", "3.12"),
+                 or a constraint (e.g., "^20.1", "~3.12.1", ">=18 <21")
     """
     try:
         commit = NixhubSearch.get_commit(name, version)
@@ -313,6 +411,39 @@ async def find_nixpkgs_commit_with_package_version(name: str, version: str) -> s
     return str(commit)
 
 
+@mcp.tool()
+async def find_nixpkgs_commit_with_package_versions(packages: dict[str, str]) -> str:
+    """Get nixpkgs commit hashes for several package versions at once.
+
+    Use this to pin a dev shell: returns the commit for each package, and a
+    single nixpkgs commit providing all of the requested versions if one exists.
+
+    Args:
+        packages: Package names mapped to an exact version, a prefix or a constraint
+                  (e.g., {"nodejs": "20", "python3": "3.12", "go": ">=1.22"})
+    """
+    if not packages:
+        return "Error: No packages given"
+
+    result = NixhubSearch.get_commits(packages)
+
+    sections = []
+    for name in packages:
+        if name in result.errors:
+            sections.append(_format_error(result.errors[name]))
+        else:
+            sections.append(str(result.commits[name]))
+
+    if len(packages) > 1 and result.common:
+        lines = [f"Common commit: {result.common_commit}"]
+        lines += [f"  {commit.name} {commit.version} ({commit.attribute_path})" for commit in result.common.values()]
+        sections.append("\n".join(lines))
+    elif len(packages) > 1 and not result.errors:
+        sections.append("No single nixpkgs commit has all of these versions, pin each package separately.")
+
+    return "\n\n".join(sections)
+
+
 # =============================================================================
 # Noogle tools
 # =============================================================================
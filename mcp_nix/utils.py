@@ -1,10 +1,100 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
-from bs4 import BeautifulSoup
+from functools import lru_cache
+from html.parser import HTMLParser
 
+# Strings inside these tags are not plain NavigableStrings in BeautifulSoup and are skipped by get_text
+_SKIPPED_TAGS = frozenset({"script", "style", "template", "rt", "rp"})
+_PRESERVE_WHITESPACE_TAGS = frozenset({"pre", "textarea"})
+_ASCII_SPACES = str.maketrans("", "", "\x20\x0a\x09\x0c\x0d")
 
+
+class _TextExtractor(HTMLParser):
+    """Streaming tag stripper producing the same text as BeautifulSoup's get_text(separator=" ")."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.strings: list[str] = []
+        self._pending: list[str] = []
+        self._skip_depth = 0
+        self._preserve_depth = 0
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        data = "".join(self._pending)
+        self._pending = []
+        if self._skip_depth:
+            return
+        # BeautifulSoup collapses whitespace-only strings outside <pre>/<textarea>
+        if not self._preserve_depth and not data.translate(_ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        self.strings.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in _PRESERVE_WHITESPACE_TAGS:
+            self._preserve_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in _SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in _PRESERVE_WHITESPACE_TAGS and self._preserve_depth:
+            self._preserve_depth -= 1
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith("CDATA[") and not self._skip_depth:
+            self.strings.append(data[6:])
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+@lru_cache(maxsize=4096)
 def html_to_text(html: str) -> str:
-    """Extract text from HTML using BeautifulSoup."""
+    """Extract text from HTML.
+
+    Plain text is returned as-is; markup goes through a streaming tag stripper
+    instead of a full BeautifulSoup tree. Results are memoized, as the same
+    descriptions come back across queries.
+    """
     if not html:
         return ""
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.get_text(separator=" ").strip()
+    if "<" not in html and "&" not in html:
+        return html.strip()
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return " ".join(extractor.strings).strip()
+
+
+def render_html_fields(record: dict, fields: tuple[str, ...]) -> dict:
+    """Return a copy of record with the given HTML fields rendered to plain text.
+
+    Used when data enters the process, so models never have to parse HTML.
+    """
+    rendered = dict(record)
+    for key in fields:
+        value = rendered.get(key)
+        if value:
+            rendered[key] = html_to_text(str(value))
+    return rendered
@@ -0,0 +1,183 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Cache warm-up: fetch and build everything the first queries would otherwise wait on.
+
+Artifacts are fetched in parallel, in two phases: configuration first, then what
+depends on it (the channels' nixpkgs commits, Home Manager's current release).
+"""
+
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .options import SUPPORTED_PROJECTS
+
+DEFAULT_WORKERS = 8
+
+
+@dataclass
+class WarmResult:
+    """Outcome of warming one artifact."""
+
+    artifact: str
+    seconds: float
+    error: str | None = None
+
+    def __str__(self) -> str:
+        status = f"failed: {self.error}" if self.error else "ok"
+        return f"{self.artifact:<40} {self.seconds:>7.2f}s  {status}"
+
+
+def _nixos_config() -> None:
+    from .search import get_channels
+
+    get_channels()
+
+
+def _homemanager_config() -> None:
+    from .homemanager import get_config
+
+    get_config()
+
+
+def _nuschtos_index(instance: str) -> Callable[[], None]:
+    def warm() -> None:
+        from .nuschtos import _get_index
+
+        _get_index(instance)
+
+    return warm
+
+
+def _nix_nomad_options() -> None:
+    from .nix_nomad import _get_options
+
+    _get_options()
+
+
+def _noogle_pagefind() -> None:
+    from .noogle import _get_pagefind
+
+    _get_pagefind().ensure_initialized()
+
+
+def _channel_revision(branch: str) -> Callable[[], None]:
+    def warm() -> None:
+        from .sources import get_channel_revision
+
+        get_channel_revision(branch)
+
+    return warm
+
+
+def _option_index(project: str) -> Callable[[], None]:
+    def warm() -> None:
+        from .options import get_backend
+
+        backend = get_backend(project)
+        backend.build_index(backend.get_default_version())
+
+    return warm
+
+
+def _homemanager_release(release_value: str) -> Callable[[], None]:
+    def warm() -> None:
+        from .homemanager import get_release_data
+
+        get_release_data(release_value)
+
+    return warm
+
+
+def _config_artifacts(projects: set[str], noogle: bool) -> dict[str, Callable[[], None]]:
+    """Artifacts with no dependencies."""
+    artifacts: dict[str, Callable[[], None]] = {}
+    if "nixos" in projects:
+        artifacts["nixos: search config and channels"] = _nixos_config
+    if "homemanager" in projects:
+        artifacts["homemanager: releases"] = _homemanager_config
+    if "nix-nomad" in projects:
+        artifacts["nix-nomad: options"] = _nix_nomad_options
+
+    nuschtos_projects = projects - {"nixos", "homemanager", "nix-nomad"}
+    if nuschtos_projects:
+        from .nuschtos import PROJECTS, _get_instance_for_project
+
+        instances = {_get_instance_for_project(project) for project in nuschtos_projects if project in PROJECTS}
+        for instance in sorted(instances):
+            artifacts[f"{instance}: index"] = _nuschtos_index(instance)
+
+    if noogle:
+        artifacts["noogle: pagefind"] = _noogle_pagefind
+    return artifacts
+
+
+def _dependent_artifacts(projects: set[str]) -> dict[str, Callable[[], None]]:
+    """Artifacts that need the configuration fetched in the first phase."""
+    artifacts: dict[str, Callable[[], None]] = {}
+    if "nixos" in projects:
+        from .search import get_config
+
+        for channel in get_config().channels:
+            artifacts[f"nixos: {channel['branch']} commit"] = _channel_revision(channel["branch"])
+    if "homemanager" in projects:
+        from .homemanager import get_config
+
+        release = get_config().default_release
+        artifacts[f"homemanager: {release} options"] = _homemanager_release(release)
+
+    from .option_index import is_enabled
+
+    if is_enabled():
+        # Each fetches what its index is built from, so it doesn't wait on the tasks above
+        for project in sorted(projects):
+            artifacts[f"{project}: local option index"] = _option_index(project)
+    return artifacts
+
+
+def _run(artifact: str, fn: Callable[[], None]) -> WarmResult:
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        return WarmResult(artifact, time.perf_counter() - start, error=str(e) or type(e).__name__)
+    return WarmResult(artifact, time.perf_counter() - start)
+
+
+def _run_all(
+    executor: ThreadPoolExecutor,
+    artifacts: dict[str, Callable[[], None]],
+    on_result: Callable[[WarmResult], None] | None,
+) -> list[WarmResult]:
+    futures = [executor.submit(_run, artifact, fn) for artifact, fn in artifacts.items()]
+    results = []
+    for future in futures:
+        result = future.result()
+        if on_result:
+            on_result(result)
+        results.append(result)
+    return results
+
+
+def warm(
+    projects: list[str] | None = None,
+    *,
+    noogle: bool = True,
+    workers: int = DEFAULT_WORKERS,
+    on_result: Callable[[WarmResult], None] | None = None,
+) -> list[WarmResult]:
+    """Warm the caches for the given option projects (all by default) and Noogle.
+
+    Failures are reported in the results rather than raised, so one unreachable
+    upstream doesn't stop the others from being warmed.
+    """
+    selected = set(projects) if projects is not None else set(SUPPORTED_PROJECTS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcp-nix-warm") as executor:
+        results = _run_all(executor, _config_artifacts(selected, noogle), on_result)
+        failed = {result.artifact for result in results if result.error}
+        if "nixos: search config and channels" in failed:
+            selected.discard("nixos")
+        if "homemanager: releases" in failed:
+            selected.discard("homemanager")
+        results += _run_all(executor, _dependent_artifacts(selected), on_result)
+    return results
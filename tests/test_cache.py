@@ -1,12 +1,14 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 """Tests for cache module."""
 
+import functools
 import tempfile
 from dataclasses import dataclass
 
+import diskcache
 import pytest
 
-from mcp_nix.cache import APIError, Cache
+from mcp_nix.cache import APIError, Cache, CachedResponse, CompressedDisk, _response_token
 
 
 @dataclass
@@ -147,3 +149,191 @@ def test_request_handles_404():
 
         # Verify nothing was cached
         assert cache.get(url) is None
+
+
+def test_compressed_disk_round_trips_large_values():
+    """Large pickled values are stored compressed and read back transparently."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = Cache(tmpdir, disk=CompressedDisk)
+        value = {"options": [{"title": f"programs.git.option{i}", "description": "Enable Git."} for i in range(200)]}
+
+        cache.set("key", value)
+
+        assert cache.get("key") == value
+        raw = Cache(tmpdir).get("key")
+        assert isinstance(raw, bytes) and raw.startswith(CompressedDisk.MARKER)
+
+
+def test_compressed_disk_reads_uncompressed_entries():
+    """Entries written before compression was enabled are still readable."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        value = {"data": "x" * 10_000}
+        Cache(tmpdir).set("key", value)
+
+        assert Cache(tmpdir, disk=CompressedDisk).get("key") == value
+
+
+def test_compressed_cache_reopens_with_plain_diskcache():
+    """The compression level isn't persisted as a diskcache setting that plain Disks reject."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        Cache(tmpdir, disk=CompressedDisk.at_level(1)).set("key", "value")
+
+        assert diskcache.Cache(tmpdir).get("key") == "value"
+
+
+def test_get_or_set_serves_hot_keys_from_memory():
+    """Repeated reads reuse the in-memory value and callback result without touching disk."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = Cache(tmpdir)
+        cache.set("key", {"data": 1})
+
+        def callback(value):
+            return [value["data"]]
+
+        first = cache.get_or_set("key", lambda: None, callback=callback)
+        Cache(tmpdir).set("key", {"data": 2})  # Bypasses this instance's memory tier
+        assert cache.get_or_set("key", lambda: None, callback=callback) is first
+
+        cache.set("key", {"data": 3})
+        assert cache.get_or_set("key", lambda: None, callback=callback) == [3]
+
+
+def test_get_or_set_memoizes_partials_and_bound_methods_by_their_arguments():
+    """Callbacks that aren't plain functions are keyed by what they are bound to."""
+
+    @dataclass(frozen=True)
+    class Scale:
+        factor: int
+
+        def apply(self, value):
+            return value * self.factor
+
+    def scale(factor, value):
+        return value * factor
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = Cache(tmpdir)
+        cache.set("key", 2)
+
+        assert cache.get_or_set("key", lambda: None, callback=functools.partial(scale, 3)) == 6
+        assert cache.get_or_set("key", lambda: None, callback=functools.partial(scale, 5)) == 10
+        assert cache.get_or_set("key", lambda: None, callback=Scale(3).apply) == 6
+        assert cache.get_or_set("key", lambda: None, callback=Scale(5).apply) == 10
+        assert cache.get_or_set("key", lambda: None, callback=str) == "2"
+
+
+def test_memory_tier_evicts_least_recently_used_within_budget():
+    """The memory tier stays under its byte budget and skips values larger than it."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = Cache(tmpdir, memory_limit=250)
+        for key in ("a", "b", "c"):
+            cache.get_or_set(key, lambda: b"x" * 100, callback=len)
+
+        assert cache.memory.get("a") is None
+        assert cache.memory.get("b") is not None and cache.memory.get("c") is not None
+
+        cache.get_or_set("big", lambda: b"x" * 1000, callback=len)
+        assert cache.memory.get("big") is None
+        assert cache.get("big") == b"x" * 1000
+
+
+def test_memory_tier_counts_callback_results_in_budget():
+    """Parsed results count toward the memory limit, and aren't memoized when they don't fit."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = Cache(tmpdir, memory_limit=100_000)
+        cache.set("key", "value")
+        calls = []
+
+        def parse_large(value):
+            calls.append(value)
+            return [f"{value}{i}" for i in range(10_000)]
+
+        def parse_small(value):
+            return [f"{value}{i}" for i in range(100)]
+
+        cache.get_or_set("key", lambda: None, callback=parse_large)
+        cache.get_or_set("key", lambda: None, callback=parse_large)
+        assert len(calls) == 2
+
+        before = cache.memory._size
+        small = cache.get_or_set("key", lambda: None, callback=parse_small)
+        assert cache.memory._size > before
+        assert cache.get_or_set("key", lambda: None, callback=parse_small) is small
+
+
+def test_request_derived_reuses_result_until_response_changes():
+    """Derived results survive restarts and are recomputed only for new content."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url = "https://example.org/data.json"
+        response = CachedResponse(content=b'{"n": 1}', status_code=200, headers={}, url=url)
+        setup = Cache(tmpdir)
+        setup.set(url, response)
+        setup.set((url, "token"), _response_token(response))
+        calls = []
+
+        def parse(r):
+            calls.append(r)
+            return r.json()["n"]
+
+        assert Cache(tmpdir).request_derived(url, parse) == 1
+        assert Cache(tmpdir).request_derived(url, parse) == 1
+        assert len(calls) == 1
+
+        changed = CachedResponse(content=b'{"n": 2}', status_code=200, headers={}, url=url)
+        setup.set(url, changed)
+        setup.set((url, "token"), _response_token(changed))
+        assert Cache(tmpdir).request_derived(url, parse) == 2
+        assert len(calls) == 2
+
+
+def test_request_derived_expires_with_response():
+    """Derived results expire like the response, so results of outdated responses don't pile up."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url = "https://example.org/data.json"
+        response = CachedResponse(content=b'{"n": 1}', status_code=200, headers={}, url=url)
+        cache = Cache(tmpdir)
+        cache.set(url, response)
+        cache.set((url, "token"), _response_token(response))
+
+        cache.request_derived(url, lambda r: r.json()["n"], expire=60)
+
+        (derived_key,) = [key for key in cache.iterkeys() if key[:2] == (url, "derived")]
+        _, expire_time = cache.get(derived_key, expire_time=True)
+        assert expire_time is not None
+
+
+def test_request_derived_is_keyed_by_callback():
+    """Results of another callback, or unreadable ones, are recomputed instead of reused."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url = "https://example.org/data.json"
+        response = CachedResponse(content=b'{"n": 1}', status_code=200, headers={}, url=url)
+        cache = Cache(tmpdir)
+        cache.set(url, response)
+        cache.set((url, "token"), _response_token(response))
+
+        def parse_n(r):
+            return r.json()["n"]
+
+        def parse_keys(r):
+            return sorted(r.json())
+
+        assert cache.request_derived(url, parse_n) == 1
+        assert cache.request_derived(url, parse_keys) == ["n"]
+
+        (derived_key,) = [key for key in cache.iterkeys() if key[:2] == (url, "derived") and "parse_n" in key[2][0]]
+        cache.set(derived_key, "not a (token, result) pair")
+        assert Cache(tmpdir).request_derived(url, parse_n) == 1
+
+
+def test_token_reads_stored_token_without_the_response():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url = "https://example.org/data.json"
+        response = CachedResponse(content=b'{"n": 1}', status_code=200, headers={}, url=url)
+        setup = Cache(tmpdir)
+        setup.set(url, response)
+
+        # Responses cached before tokens were recorded get one from their content
+        assert Cache(tmpdir).token(url) == _response_token(response)
+
+        setup.delete(url)
+        assert Cache(tmpdir).token(url) == _response_token(response)
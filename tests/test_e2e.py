@@ -96,6 +96,10 @@ async def test_list_versions_latest_only(snapshot):
 async def test_show_option_details_nixos_leaf(snapshot):
     """Leaf option returns full details."""
     async with create_connected_server_and_client_session(mcp._mcp_server) as client:
+        # Line counts are only shown once the declaration has been fetched
+        await client.call_tool(
+            "read_option_declaration", {"project": "nixos", "name": "time.timeZone", "version": "25.11"}
+        )
         result = await client.call_tool(
             "show_option_details", {"project": "nixos", "name": "time.timeZone", "version": "25.11"}
         )
@@ -112,6 +116,9 @@ async def test_show_option_details_nixos_prefix(snapshot):
 async def test_show_option_details_homemanager_leaf(snapshot):
     """Home Manager leaf option returns full details."""
     async with create_connected_server_and_client_session(mcp._mcp_server) as client:
+        await client.call_tool(
+            "read_option_declaration", {"project": "homemanager", "name": "programs.git.enable", "version": "25.11"}
+        )
         result = await client.call_tool(
             "show_option_details", {"project": "homemanager", "name": "programs.git.enable", "version": "25.11"}
         )
@@ -130,13 +137,17 @@ async def test_show_option_details_homemanager_prefix(snapshot):
 async def test_show_option_details_nixvim(snapshot):
     """Get NixVim option details."""
     async with create_connected_server_and_client_session(mcp._mcp_server) as client:
+        await client.call_tool("read_option_declaration", {"project": "nixvim", "name": "colorscheme"})
         result = await client.call_tool("show_option_details", {"project": "nixvim", "name": "colorscheme"})
         assert result.content[0].text == snapshot
 
 
 async def test_show_option_details_with_reference(snapshot):
-    """Leaf option includes reference with line count."""
+    """Leaf option includes reference with line count once the declaration was fetched."""
     async with create_connected_server_and_client_session(mcp._mcp_server) as client:
+        await client.call_tool(
+            "read_option_declaration", {"project": "nixos", "name": "time.timeZone", "version": "25.11"}
+        )
         result = await client.call_tool(
             "show_option_details", {"project": "nixos", "name": "time.timeZone", "version": "25.11"}
         )
@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for nix_nomad module."""
+
+from mcp_nix.nix_nomad import NixNomadOption, OptionsIndex, _parse_options
+
+# Excerpt of the DocBook manual page, with an entry that isn't an option and one without a <dd>
+PAGE = """<!DOCTYPE html><html><body><div class="variablelist"><dl class="variablelist">
+<dt><span class="term"><a id="opt-job._name_.datacenters"></a><a class="term" href="options.html#opt-job._name_.datacenters">
+<code class="option">job.&lt;name&gt;.datacenters</code></a></span></dt>
+<dd><p>A list of datacenters in the region which are eligible for task placement.</p>
+<p><span class="emphasis"><em>Type:</em></span> list of string</p>
+<p><span class="emphasis"><em>Default:</em></span> <code class="literal">[ ]</code></p>
+<p><span class="emphasis"><em>Example:</em></span></p><pre class="programlisting">[
+  "dc1"
+]
+</pre>
+<p><span class="emphasis"><em>Declared by:</em></span></p><table class="simplelist"><tr><td>
+<a class="filename" href="x"><code class="filename">&lt;nix-nomad/modules/job.nix&gt;</code></a></td></tr></table>
+</dd>
+<dt><span class="term"><a id="sec-job"></a><code class="option">not.an.option</code></span></dt>
+<dd><p>Skipped.</p></dd>
+<dt><span class="term"><a id="opt-job._name_.orphan"></a><code class="option">job.&lt;name&gt;.orphan</code></span></dt>
+</dl><dl class="variablelist">
+<dt><span class="term"><a id="opt-job._name_.type"></a><code class="option">job.&lt;name&gt;.type</code></span></dt>
+<dd><p>Specifies the <em>Nomad scheduler</em> to use.</p>
+<p><span class="emphasis"><em>Type:</em></span> one of &quot;service&quot;, &quot;batch&quot;</p>
+<p><span class="emphasis"><em>Example:</em></span> <code class="literal">"batch"</code></p>
+</dd></dl></div></body></html>"""
+
+
+def _option(name: str, description: str = "") -> NixNomadOption:
+    return NixNomadOption(name=name, description=description)
+
+
+INDEX = OptionsIndex.build(
+    {
+        opt.name: opt
+        for opt in [
+            _option("job", "Nomad jobs."),
+            _option("job.<name>.group.<name>.restart.attempts", "Number of restart attempts."),
+            _option("job.<name>.group.<name>.network.port", "Ports to allocate."),
+            _option("job.<name>.group.<name>.network.portLabel", "Label of the port."),
+            _option("job.<name>.group.<name>.task.<name>.driver", "Task driver, such as docker."),
+        ]
+    }
+)
+
+
+def _names(query: str) -> list[str]:
+    return [opt.name for opt in INDEX.search(query, 10).items]
+
+
+def test_search_keeps_score_tiers():
+    assert _names("job")[0] == "job"
+    assert _names("JOB.<name>.group.<name>.restart") == ["job.<name>.group.<name>.restart.attempts"]
+    assert _names("docker") == ["job.<name>.group.<name>.task.<name>.driver"]
+
+
+def test_search_prefers_whole_word_matches():
+    assert _names("port") == ["job.<name>.group.<name>.network.port", "job.<name>.group.<name>.network.portLabel"]
+
+
+def test_search_matches_all_words_out_of_order():
+    assert _names("attempts restart") == ["job.<name>.group.<name>.restart.attempts"]
+
+
+def test_short_queries_scan_all_options():
+    result = INDEX.search("jo", 10)
+    assert result.total == 5
+
+
+def test_parse_options_reads_dt_dd_pairs():
+    options = _parse_options(PAGE)
+
+    assert list(options) == ["job.<name>.datacenters", "job.<name>.type"]
+    assert options["job.<name>.datacenters"] == NixNomadOption(
+        name="job.<name>.datacenters",
+        type="list of string",
+        description="A list of datacenters in the region which are eligible for task placement.",
+        default="[ ]",
+        example='[\n  "dc1"\n]',
+    )
+    # A first paragraph with an <em> isn't taken as the description
+    assert options["job.<name>.type"] == NixNomadOption(
+        name="job.<name>.type", type='one of "service", "batch"', example='"batch"'
+    )
@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for nixhub module."""
+
+import pytest
+
+from mcp_nix import nixhub
+from mcp_nix.nixhub import InvalidConstraintError, NixhubSearch, PackageNotFoundError, VersionMap, VersionNotFoundError
+
+
+def _release(version: str, *commits: str) -> dict:
+    return {
+        "version": version,
+        "last_updated": "2024-01-01T00:00:00Z",
+        "platforms": [{"attribute_path": f"pkg_{version}", "commit_hash": commit} for commit in commits],
+    }
+
+
+def test_version_map_keeps_first_release_with_platforms():
+    version_map = VersionMap.build(
+        {"releases": [_release("2.0.0"), _release("2.0.0", "b", "c"), _release("1.0.0", "a"), _release("2.0.0", "d")]}
+    )
+
+    assert version_map.versions == ["2.0.0", "2.0.0", "1.0.0", "2.0.0"]
+    assert [p.commit_hash for p in version_map.platforms["2.0.0"]] == ["b", "c"]
+    assert version_map.platforms["1.0.0"][0].attribute_path == "pkg_1.0.0"
+    assert len(version_map.releases) == 4
+
+
+VERSIONS = VersionMap.build(
+    {
+        "releases": [
+            _release(v, f"commit-{v}")
+            for v in ["21.1.0", "20.11.1", "20.11.0", "20.9.0", "20.0.0-rc1", "18.19.0", "3.12.1", "3.1.4", "0.2.5"]
+        ]
+    }
+)
+
+
+@pytest.mark.parametrize(
+    ("spec", "expected"),
+    [
+        ("20.11.0", "20.11.0"),
+        ("20", "20.11.1"),
+        ("20.x", "20.11.1"),
+        ("3.1", "3.1.4"),
+        ("^20.9", "20.11.1"),
+        ("~20.9.0", "20.9.0"),
+        ("^0.2.1", "0.2.5"),
+        (">=18 <20", "18.19.0"),
+        (">= 18", "21.1.0"),
+        (">= 18, < 20", "18.19.0"),
+        ("<20", "18.19.0"),
+        ("<=20", "20.11.1"),
+        (">20", "21.1.0"),
+        (">=21.2", None),
+        ("20.11.5", None),
+    ],
+)
+def test_resolve_constraints(spec, expected):
+    assert VERSIONS.resolve(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["^18 || ^20", ">=", "*"])
+def test_resolve_rejects_terms_without_a_version(spec):
+    with pytest.raises(InvalidConstraintError):
+        VERSIONS.resolve(spec)
+
+
+def test_closest_versions_come_first():
+    assert VERSIONS.closest("20.10.0")[:3] == ["20.11.1", "20.11.0", "20.9.0"]
+    assert VERSIONS.closest("999.0")[0] == "21.1.0"
+
+
+def test_get_commit_records_the_requested_constraint(monkeypatch):
+    monkeypatch.setattr(nixhub, "get_version_map", lambda name: VERSIONS)
+
+    commit = NixhubSearch.get_commit("nodejs", "20")
+    assert (commit.version, commit.commit_hash, commit.requested) == ("20.11.1", "commit-20.11.1", "20")
+    assert NixhubSearch.get_commit("nodejs", "20.11.0").requested is None
+
+    with pytest.raises(VersionNotFoundError) as e:
+        NixhubSearch.get_commit("nodejs", "19")
+    assert e.value.available[0] == "20.11.1"
+
+
+def test_get_commits_finds_a_common_commit(monkeypatch):
+    maps = {
+        "nodejs": VersionMap.build({"releases": [_release("20.11.1", "b"), _release("20.11.0", "a", "c")]}),
+        "go": VersionMap.build(
+            {"releases": [_release("1.22.1", "x"), _release("1.22.0", "c"), _release("1.21.0", "b")]}
+        ),
+    }
+
+    fetched = []
+
+    def get_version_map(name):
+        fetched.append(name)
+        if name not in maps:
+            raise PackageNotFoundError(name)
+        return maps[name]
+
+    monkeypatch.setattr(nixhub, "get_version_map", get_version_map)
+
+    result = NixhubSearch.get_commits({"nodejs": "20", "go": ">=1.22"})
+    assert sorted(fetched) == ["go", "nodejs"]  # Each package's version map is fetched once
+    assert {name: commit.version for name, commit in result.commits.items()} == {"nodejs": "20.11.1", "go": "1.22.1"}
+    assert result.common_commit == "c"
+    assert {name: commit.version for name, commit in result.common.items()} == {"nodejs": "20.11.0", "go": "1.22.0"}
+
+    assert NixhubSearch.get_commits({"nodejs": "20.11.1", "go": "1.22"}).common == {}
+
+    result = NixhubSearch.get_commits({"nodejs": "20", "missing": "1"})
+    assert isinstance(result.errors["missing"], PackageNotFoundError)
+    assert result.commits["nodejs"].version == "20.11.1"
+    assert result.common == {}
+
+    assert NixhubSearch.get_commits({"nodejs": "20"}).common == {}  # Nothing to have in common
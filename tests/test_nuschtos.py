@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for nuschtos module."""
+
+import json
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+import pyixx
+
+if not hasattr(pyixx, "Index"):
+    pytest.skip("pyixx extension isn't built", allow_module_level=True)
+
+from mcp_nix import cache, nuschtos, snapshot
+from mcp_nix.cache import CachedResponse
+
+CHUNK_SIZE = 2
+
+
+class _Meta:
+    chunk_size = CHUNK_SIZE
+
+
+def _chunk(instance: str, chunk: int, names: list[str]) -> tuple[str, CachedResponse]:
+    url = f"{nuschtos.INSTANCES[instance]}/meta/{chunk}.json"
+    content = json.dumps([{"name": name} for name in names]).encode()
+    headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+    return url, CachedResponse(content=content, status_code=200, headers=headers, url=url)
+
+
+def test_list_options_offline_stops_after_recorded_chunks(monkeypatch, tmp_path):
+    """With a multiple of the chunk size, the last chunk is full and nothing marks the end but the snapshot."""
+    monkeypatch.setattr(snapshot, "_active", None)
+    monkeypatch.setattr(cache, "_replayer", None)
+    monkeypatch.setattr(nuschtos, "_cache", cache.Cache(str(tmp_path / "cache")))
+    responses = dict([_chunk("nixvim", 0, ["a", "b"]), _chunk("nixvim", 1, ["c", "d"])])
+    path = str(tmp_path / "snapshot.db")
+    snapshot._write(path, responses, {}, {"nuschtos_chunks": json.dumps({"nixvim": 2})})
+    snapshot.activate(path)
+    index_data = nuschtos.IndexData(index=None, meta=_Meta())  # type: ignore[arg-type]
+    monkeypatch.setattr(
+        nuschtos.NuschtosSearch, "_get_project_context", staticmethod(lambda project: ("nixvim", index_data, None))
+    )
+
+    options = nuschtos.NuschtosSearch.list_options("nixvim")
+
+    assert [opt.name for opt in options] == ["a", "b", "c", "d"]
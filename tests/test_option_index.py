@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for option_index module."""
+
+import pytest
+
+from mcp_nix import option_index
+from mcp_nix.cache import Cache
+from mcp_nix.option_index import OptionIndex
+from mcp_nix.options import UnifiedOption
+from mcp_nix.search import InvalidLimitError
+
+
+def _option(name: str, description: str = "") -> UnifiedOption:
+    return UnifiedOption(name, "", description, "", "", None, "nixos")
+
+
+INDEX = OptionIndex.build(
+    "0" * 40,
+    [
+        _option("services.nginx.enable", "Whether to enable Nginx Web Server."),
+        _option("services.nginx.virtualHosts.<name>.root", "The path of the web root directory."),
+        _option("services.nginx-exporter.enable", "Whether to enable the nginx exporter."),
+        _option("services.nginx", "Nginx settings."),
+        _option("programs.git.enable", "Whether to enable git, a distributed version control system."),
+        _option("programs.gitui.enable", "Whether to enable gitui."),
+    ],
+)
+
+
+def test_get_option_by_exact_name():
+    assert INDEX.get("programs.git.enable").name == "programs.git.enable"
+    assert INDEX.get("programs.git") is None
+
+
+def test_children_are_options_under_the_prefix():
+    names = [opt.name for opt in INDEX.children("services.nginx")]
+    assert names == ["services.nginx.enable", "services.nginx.virtualHosts.<name>.root"]
+
+
+def test_search_ranks_name_matches_before_description_matches():
+    result = INDEX.search("nginx", 10)
+
+    assert result.total == 4
+    assert [opt.name for opt in result.items][:2] == ["services.nginx", "services.nginx.enable"]
+
+    result = INDEX.search("version control", 10)
+    assert [opt.name for opt in result.items] == ["programs.git.enable"]
+
+
+def test_search_ranks_exact_and_prefix_name_matches_first():
+    assert [opt.name for opt in INDEX.search("Programs.Git", 10).items][:2] == [
+        "programs.git.enable",
+        "programs.gitui.enable",
+    ]
+    assert INDEX.search("services.nginx", 1).items[0].name == "services.nginx"
+
+
+def test_search_validates_limit():
+    with pytest.raises(InvalidLimitError):
+        INDEX.search("nginx", 0)
+
+
+def test_search_scores_only_the_heaviest_postings_of_a_word(monkeypatch):
+    monkeypatch.setattr(option_index, "MAX_POSTINGS", 1)
+    index = OptionIndex.build(
+        None, [_option("a.enable", "Whether to enable a."), _option("b.enable", "Whether to enable b, enable it.")]
+    )
+
+    result = index.search("whether", 10)
+
+    assert [opt.name for opt in result.items] == ["a.enable"]  # The shorter description weighs "whether" more
+    assert result.total == 2
+
+
+def test_get_index_keeps_last_index_without_revision(monkeypatch, tmp_path):
+    """A revision that can't be known doesn't throw away the index of the last one."""
+    monkeypatch.setattr(option_index, "_cache", Cache(str(tmp_path)))
+    monkeypatch.setattr(option_index, "_indexes", {})
+    monkeypatch.setattr(option_index, "_build_locks", {})
+    built = option_index.get_index("test", "latest", "0" * 40, lambda: [_option("a.enable")])
+
+    assert option_index.get_index("test", "latest", None, lambda: []) is built
+    assert option_index.get_index("test", "latest", "1" * 40, lambda: []).options == []
@@ -0,0 +1,102 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for options module."""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from mcp_nix import options, search
+from mcp_nix.cache import APIError
+from mcp_nix.models import SearchResult
+from mcp_nix.options import InvalidProjectError, UnifiedOption, VersionRegistry, resolve_projects
+from mcp_nix.search import InvalidChannelError
+
+
+def test_version_registry_loads_once():
+    loads = []
+
+    def load():
+        loads.append(1)
+        return ["unstable", "25.05"]
+
+    registry = VersionRegistry(load)
+    assert "25.05" in registry
+    assert "24.11" not in registry
+    assert len(loads) == 1
+
+
+def test_version_registry_refreshes_in_background():
+    """Stale versions are still served while the refresh runs, and kept if it fails."""
+    versions = [["unstable"], ["unstable", "25.11"]]
+
+    def load():
+        if not versions:
+            raise requests.ConnectionError("unreachable")
+        return versions.pop(0)
+
+    registry = VersionRegistry(load, refresh_interval=0)
+    assert "25.11" not in registry  # Initial load
+    assert "25.11" not in registry  # Stale, starts a refresh
+    registry._refresh_thread.join()
+    assert "25.11" in registry  # Starts a refresh that fails
+
+    registry._refresh_thread.join()
+    assert "25.11" in registry
+
+
+def test_nixos_revision_of_unknown_channel_raises_api_error(monkeypatch):
+    config = SimpleNamespace(channels=[{"id": "unstable", "branch": "nixos-unstable"}])
+    monkeypatch.setattr(search, "get_config", lambda: config)
+
+    with pytest.raises(InvalidChannelError):
+        options.NixOSClient().get_revision("24.05")
+
+
+def _option(name: str, project: str) -> UnifiedOption:
+    return UnifiedOption(name, "boolean", "", "", "", None, project)
+
+
+def test_search_all_merges_and_reports_slow_projects(monkeypatch):
+    """Name matches rank first across projects; a slow or failing project doesn't block the rest."""
+    results = {
+        "nixos": [_option("services.git.enable", "nixos"), _option("git", "nixos")],
+        "homemanager": [_option("programs.git.enable", "homemanager")],
+    }
+
+    def search_project(project, query, limit, version):
+        if project == "nixvim":
+            time.sleep(1)
+        if project == "nix-darwin":
+            raise APIError("unreachable")
+        return SearchResult(items=results.get(project, []), total=len(results.get(project, [])))
+
+    monkeypatch.setattr(options, "_search_project", search_project)
+    result = options.search_all("git", 10, resolve_projects("nixos, homemanager,nixvim,nix-darwin"), timeout=0.2)
+
+    assert [opt.name for opt in result.items] == ["git", "services.git.enable", "programs.git.enable"]
+    assert result.total == 3
+    assert result.failed == {"nixvim": "timed out", "nix-darwin": "unreachable"}
+
+
+def test_search_all_applies_per_backend_timeouts(monkeypatch):
+    """Each project is only left out once its own timeout has passed."""
+
+    def search_project(project, query, limit, version):
+        time.sleep(1 if project == "nixos" else 0.2)
+        return SearchResult(items=[_option("git", project)], total=1)
+
+    monkeypatch.setattr(options, "_search_project", search_project)
+    monkeypatch.setattr(options, "FEDERATED_TIMEOUT", 0.1)
+    monkeypatch.setattr(options, "BACKEND_TIMEOUTS", {"homemanager": 0.5})
+    result = options.search_all("git", 10, ["nixos", "homemanager"])
+
+    assert [opt.project for opt in result.items] == ["homemanager"]
+    assert result.failed == {"nixos": "timed out"}
+
+
+def test_resolve_projects_rejects_unknown():
+    assert resolve_projects("all") == options.SUPPORTED_PROJECTS
+    with pytest.raises(InvalidProjectError):
+        resolve_projects("nixos,nope")
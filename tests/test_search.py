@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for search module."""
+
+import tempfile
+
+from mcp_nix import search
+from mcp_nix.cache import Cache
+from mcp_nix.models import Package
+from mcp_nix.search import NixOSSearch
+
+
+def test_es_query_results_are_cached(monkeypatch):
+    """Identical queries are answered from the cache; scans with search_after always hit ES."""
+    requests = []
+
+    def post(index, body):
+        requests.append(body)
+        return [{"_source": {"option_name": "a"}}], 1
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(search, "_cache", Cache(tmpdir))
+        monkeypatch.setattr(NixOSSearch, "_es_post", staticmethod(post))
+        query = {"bool": {"must": [{"term": {"type": "option"}}]}}
+
+        first, _ = NixOSSearch._es_query("index", query, 20)
+        first.append({})  # Callers extending a result don't affect the cache
+        assert NixOSSearch._es_query("index", query, 20) == ([{"_source": {"option_name": "a"}}], 1)
+        assert len(requests) == 1
+
+        NixOSSearch._es_query("index", query, 10)
+        NixOSSearch._es_query("index", query, 10, search_after=["a"])
+        NixOSSearch._es_query("index", query, 10, search_after=["a"])
+        assert len(requests) == 4
+
+
+def test_es_msearch_sends_only_uncached_searches(monkeypatch):
+    """Batched searches share the _es_query cache, and the misses go out in one _msearch request."""
+    batches = []
+
+    def msearch_post(index, bodies):
+        batches.append(bodies)
+        return [([{"_source": {"option_name": str(body["size"])}}], 1) for body in bodies]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(search, "_cache", Cache(tmpdir))
+        monkeypatch.setattr(NixOSSearch, "_es_msearch_post", staticmethod(msearch_post))
+        monkeypatch.setattr(NixOSSearch, "_es_post", staticmethod(lambda index, body: msearch_post(index, [body])[0]))
+        query = {"term": {"type": "option"}}
+
+        NixOSSearch._es_query("index", query, 1)
+        bodies = [search._search_body(query, size, 0) for size in (1, 2, 3)]
+        results = NixOSSearch._es_msearch("index", bodies)
+
+        assert [hits[0]["_source"]["option_name"] for hits, _ in results] == ["1", "2", "3"]
+        assert [[body["size"] for body in batch] for batch in batches] == [[1], [2, 3]]
+
+
+def test_package_fields_request_homepage():
+    """Only the listed fields are returned by Elasticsearch, so each one must be its document name."""
+    assert "package_homepage" in search.PACKAGE_FIELDS
+
+    package = Package.model_validate(
+        {"package_pname": "git", "package_pversion": "2.49.0", "package_homepage": ["https://git-scm.com/"]}
+    )
+
+    assert package.homepage == "https://git-scm.com/"
+
+
+def test_search_queries_share_cache_across_case_and_whitespace(monkeypatch):
+    requests = []
+
+    def post(index, body):
+        requests.append(body)
+        return [], 0
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(search, "_cache", Cache(tmpdir))
+        monkeypatch.setattr(NixOSSearch, "_es_post", staticmethod(post))
+        monkeypatch.setattr(NixOSSearch, "_get_channel_index", staticmethod(lambda channel: "index"))
+
+        NixOSSearch.search_options("OpenSSH", 20, "unstable")
+        NixOSSearch.search_options(" openssh ", 20, "unstable")
+        NixOSSearch.search_packages("Git", 20, "unstable")
+        NixOSSearch.search_packages("git\n", 20, "unstable")
+
+        assert len(requests) == 2
@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for snapshot module."""
+
+import sqlite3
+import tempfile
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from mcp_nix import cache, snapshot
+from mcp_nix.cache import Cache, CachedResponse
+from mcp_nix.search import NixOSSearch
+
+INDEX = "latest-44-nixos-25.05"
+URL = "https://example.org/config.json"
+
+OPTIONS = [
+    {"type": "option", "option_name": "services.nginx.enable", "option_description": "Whether to enable Nginx."},
+    {"type": "option", "option_name": "services.nginx.package", "option_description": "The nginx package to use."},
+    {"type": "option", "option_name": "programs.git.enable", "option_description": "Whether to enable Git."},
+]
+PACKAGES = [
+    {"type": "package", "package_pname": "nginx", "package_description": "A reverse proxy and web server"},
+    {"type": "package", "package_pname": "git", "package_description": "Distributed version control system"},
+]
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    """Activate a small snapshot, restoring online mode afterwards."""
+    monkeypatch.setattr(snapshot, "_active", None)
+    monkeypatch.setattr(cache, "_replayer", None)
+    path = str(tmp_path / "snapshot.db")
+    response = CachedResponse(
+        content=b'{"answer": 42}',
+        status_code=200,
+        headers=CaseInsensitiveDict({"Content-Type": "application/json"}),
+        url=URL,
+    )
+    snapshot._write(
+        path,
+        {URL: response},
+        {(INDEX, "option"): OPTIONS, (INDEX, "package"): PACKAGES},
+        {"channels": '["25.05"]'},
+    )
+    return snapshot.activate(path)
+
+
+def test_requests_are_replayed_from_snapshot(offline):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_ = Cache(tmpdir)
+
+        assert cache_.request(URL, lambda r: r.json()["answer"]) == 42
+        assert cache_.request_derived(URL, lambda r: r.content_type) == "application/json"
+        assert cache_.get(URL) is None  # Nothing is written to the disk cache
+        with pytest.raises(snapshot.SnapshotError, match="Not available"):
+            cache_.request("https://example.org/missing", lambda r: r.text)
+
+
+def test_es_queries_are_evaluated_offline(offline):
+    exact = {"bool": {"must": [{"term": {"type": "option"}}, {"term": {"option_name": "programs.git.enable"}}]}}
+    hits, total = NixOSSearch._es_query(INDEX, exact, 1)
+    assert total == 1 and hits[0]["_source"]["option_name"] == "programs.git.enable"
+
+    children = {"bool": {"must": [{"term": {"type": "option"}}, {"prefix": {"option_name": "services.nginx."}}]}}
+    hits, total = NixOSSearch._es_query(INDEX, children, 20)
+    assert total == 2
+
+    search = {
+        "bool": {
+            "must": [{"term": {"type": "option"}}],
+            "should": [{"wildcard": {"option_name": "*git*"}}, {"match": {"option_description": "enable"}}],
+            "minimum_should_match": 1,
+        }
+    }
+    hits, total = NixOSSearch._es_query(INDEX, search, 20)
+    assert [hit["_source"]["option_name"] for hit in hits] == [
+        "programs.git.enable",
+        "services.nginx.enable",
+    ]
+
+    insensitive = {"wildcard": {"option_name": {"value": "*GIT*", "case_insensitive": True}}}
+    hits, total = NixOSSearch._es_query(INDEX, insensitive, 20)
+    assert total == 1 and hits[0]["_source"]["option_name"] == "programs.git.enable"
+
+    packages = {
+        "bool": {
+            "must": [{"term": {"type": "package"}}],
+            "should": [{"match": {"package_pname": {"query": "nginx", "boost": 3}}}],
+            "minimum_should_match": 1,
+        }
+    }
+    hits, total = NixOSSearch._es_query(INDEX, packages, 20)
+    assert total == 1 and hits[0]["_source"]["package_pname"] == "nginx"
+
+    with pytest.raises(snapshot.SnapshotError, match="not in the offline snapshot"):
+        NixOSSearch._es_query("latest-44-nixos-unstable", exact, 1)
+
+
+def test_chunk_count_is_read_from_meta(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    snapshot._write(path, {}, {}, {"nuschtos_chunks": '{"nixvim": 3}'})
+
+    loaded = snapshot.Snapshot(path)
+
+    assert loaded.chunk_count("nixvim") == 3
+    assert loaded.chunk_count("nuschtos") is None
+
+
+def test_snapshot_version_is_checked(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    snapshot._write(path, {}, {}, {})
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE meta SET value = '0' WHERE key = 'version'")
+
+    with pytest.raises(snapshot.SnapshotError, match="Unsupported snapshot version"):
+        snapshot.Snapshot(path)
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_es_query_all_pages_through_snapshot(offline, concurrent):
+    """Paginated queries terminate offline and return every document once."""
+    hits = NixOSSearch._es_query_all(INDEX, {"term": {"type": "option"}}, batch_size=2, concurrent=concurrent)
+
+    assert [hit["_source"]["option_name"] for hit in hits] == sorted(option["option_name"] for option in OPTIONS)
@@ -0,0 +1,101 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for sources module."""
+
+from mcp_nix import sources, tools
+from mcp_nix.options import UnifiedOption
+from mcp_nix.sources import CachedSource, _line_offsets
+
+
+def _source(content: str) -> CachedSource:
+    offsets = _line_offsets(content)
+    return CachedSource(content=content, line_count=len(offsets), url="", line_offsets=offsets)
+
+
+def test_line_count_matches_newline_count():
+    assert _source("a\nb\nc").line_count == 3
+    assert _source("a\nb\nc\n").line_count == 4
+    assert _source("").line_count == 0
+
+
+def test_lines_returns_inclusive_range():
+    source = _source("one\ntwo\nthree\nfour\n")
+
+    assert source.lines(1, 1) == "one"
+    assert source.lines(2, 3) == "two\nthree"
+
+
+def test_lines_clamps_to_file():
+    source = _source("one\ntwo\nthree")
+
+    assert source.lines(0, 1) == "one"
+    assert source.lines(2, 99) == "two\nthree"
+    assert source.lines(3, 2) == ""
+
+
+def test_pin_url_resolves_nixpkgs_channel_to_commit(monkeypatch):
+    """nixpkgs channel URLs are fetched at the channel's commit and cached forever."""
+    revision = "0123456789abcdef0123456789abcdef01234567"
+    monkeypatch.setattr(sources, "get_channel_revision", lambda branch: revision)
+
+    raw_url, expire = sources._pin_url(
+        "https://github.com/NixOS/nixpkgs/blob/nixos-25.11/nixos/modules/config/locale.nix"
+    )
+
+    assert raw_url == f"https://raw.githubusercontent.com/NixOS/nixpkgs/{revision}/nixos/modules/config/locale.nix"
+    assert expire is None
+
+
+def test_pin_url_keeps_other_urls():
+    raw_url, expire = sources._pin_url("https://github.com/nix-community/home-manager/blob/master/modules/a.nix")
+
+    assert raw_url == "https://raw.githubusercontent.com/nix-community/home-manager/master/modules/a.nix"
+    assert expire == sources.DEFAULT_EXPIRE
+
+
+def test_format_source_line_ranges():
+    source = _source("one\ntwo\nthree")
+
+    assert tools._format_source("u", source, 0, 1).endswith("showing 1-1\n\none")
+    assert tools._format_source("u", source, 2, None).endswith("showing 2-3\n\ntwo\nthree")
+    assert tools._format_source("u", source, 3, 2) == "Error: end_line (2) is before start_line (3)"
+    assert tools._format_source("u", source, None, 0).startswith("Error: Invalid line range")
+
+
+def test_fetch_source_records_line_count_only_when_read(monkeypatch):
+    """Cache hits don't rewrite the line count."""
+    writes = []
+    monkeypatch.setattr(sources._cache, "set", lambda key, value, **kwargs: writes.append((key, value)))
+    monkeypatch.setattr(sources._cache, "get", lambda key: 3 if writes else None)
+    monkeypatch.setattr(sources.tarball, "is_enabled", lambda: True)
+    monkeypatch.setattr(sources.tarball, "read_file", lambda rev, path: "one\ntwo\nthree")
+    url = "https://github.com/NixOS/nixpkgs/blob/0123456789abcdef0123456789abcdef01234567/a.nix"
+
+    sources.fetch_source(url)
+    sources.fetch_source(url)
+
+    assert writes == [(sources._line_count_key(url), 3)]
+
+
+class _Backend:
+    def supports_declaration_read(self) -> bool:
+        return True
+
+
+_DECLARED = UnifiedOption("programs.git.enable", "boolean", "", "", "", "https://example.org/git.nix", "homemanager")
+
+
+def test_option_details_without_known_line_count(monkeypatch):
+    """Details don't wait on the source download while its line count is unknown."""
+    monkeypatch.setattr(tools, "get_line_count", lambda url: None)
+
+    details = tools._format_option_details(_Backend(), _DECLARED.name, _DECLARED, "")
+
+    assert details.endswith("\nReference: https://example.org/git.nix (use read_option_declaration to read)")
+
+
+def test_option_details_with_known_line_count(monkeypatch):
+    monkeypatch.setattr(tools, "get_line_count", lambda url: 42)
+
+    details = tools._format_option_details(_Backend(), _DECLARED.name, _DECLARED, "")
+
+    assert details.endswith("\nReference: https://example.org/git.nix (42 lines, use read_option_declaration to read)")
@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for the local nixpkgs tarball mirror."""
+
+import gzip
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+from mcp_nix import tarball
+
+REV = "0123456789abcdef0123456789abcdef01234567"
+FILES = {"lib/default.nix": b"{ lib }: lib\n", "pkgs/top-level/all-packages.nix": b"{ }\n"}
+
+
+def _make_tar(path, files=FILES) -> None:
+    with tarfile.open(path, "w") as tar:
+        directory = tarfile.TarInfo(f"nixpkgs-{REV}/lib")
+        directory.type = tarfile.DIRTYPE
+        tar.addfile(directory)
+        for name, data in files.items():
+            info = tarfile.TarInfo(f"nixpkgs-{REV}/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    """Point the mirror at an empty directory, with downloads disabled."""
+    monkeypatch.setattr(tarball, "MIRROR_DIR", str(tmp_path))
+    monkeypatch.setattr(tarball, "_tarballs", {})
+    monkeypatch.setattr(tarball, "_downloading", set())
+    monkeypatch.setattr(tarball, "_download_enabled", False)
+    return tmp_path
+
+
+def _install(rev: str = REV) -> str:
+    """Write a tarball and its index to the mirror, like a finished download."""
+    tar_path, index_path = tarball._paths(rev)
+    _make_tar(tar_path)
+    with open(index_path, "w") as f:
+        json.dump(tarball._build_index(tar_path), f)
+    return tar_path
+
+
+def test_build_index_strips_top_level_directory(tmp_path):
+    path = tmp_path / "a.tar"
+    _make_tar(path)
+
+    members = tarball._build_index(str(path))
+
+    assert set(members) == set(FILES)
+    with open(path, "rb") as f:
+        offset, size = members["lib/default.nix"]
+        f.seek(offset)
+        assert f.read(size) == FILES["lib/default.nix"]
+
+
+def test_read_file_from_installed_tarball(mirror):
+    _install()
+
+    assert tarball.read_file(REV, "lib/default.nix") == FILES["lib/default.nix"].decode()
+    assert tarball.read_file(REV, "missing.nix") is None
+
+
+def test_load_requires_index_and_tarball(mirror):
+    assert tarball._load(REV) is None
+
+    tar_path = _install()
+    os.remove(tar_path)
+
+    assert tarball._load(REV) is None
+
+
+def test_get_tarball_without_download_returns_none(mirror):
+    assert tarball.get_tarball(REV) is None
+    assert tarball._downloading == set()
+
+
+def test_memory_hits_mark_tarball_as_used(mirror):
+    tar_path = _install()
+    tarball.get_tarball(REV)
+    os.utime(tar_path, (0, 0))
+
+    assert tarball.get_tarball(REV) is not None
+    assert os.stat(tar_path).st_mtime > 0
+
+
+def test_prune_keeps_most_recently_used(mirror, monkeypatch):
+    monkeypatch.setattr(tarball, "MAX_TARBALLS", 2)
+    revs = [f"{i}" * 40 for i in range(3)]
+    for age, rev in enumerate(revs):
+        os.utime(_install(rev), (age, age))
+    tarball.get_tarball(revs[0])  # Oldest on disk, but just used
+
+    tarball._prune()
+
+    assert sorted(name for name in os.listdir(mirror) if name.endswith(".tar")) == [f"{revs[0]}.tar", f"{revs[2]}.tar"]
+
+
+def test_read_pruned_tarball_returns_none(mirror):
+    tar_path = _install()
+    local = tarball.get_tarball(REV)
+    assert local is not None
+    os.remove(tar_path)
+
+    assert local.read("lib/default.nix") is None
+    assert tarball.read_file(REV, "lib/default.nix") is None
+
+
+def test_download_truncated_stream_cleans_up(mirror, monkeypatch):
+    tar_path = mirror / "full.tar"
+    _make_tar(tar_path)
+    data = gzip.compress(tar_path.read_bytes())[:-20]
+
+    class Response:
+        raw = io.BytesIO(data)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def raise_for_status(self):
+            pass
+
+    monkeypatch.setattr(tarball.requests, "get", lambda *args, **kwargs: Response())
+    tarball._downloading.add(REV)
+
+    tarball._download(REV)
+
+    assert tarball._downloading == set()
+    assert not any(name.endswith(".tmp") for name in os.listdir(mirror))
+    assert tarball._load(REV) is None
@@ -0,0 +1,48 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for utils module."""
+
+import pytest
+from bs4 import BeautifulSoup
+
+from mcp_nix.utils import html_to_text, render_html_fields
+
+SAMPLES = [
+    "Whether to enable Git.",
+    "  surrounding whitespace  ",
+    (
+        '<rendered-html><p>The time zone used when displaying times and dates. See <a href="https://en.wikipedia.org'
+        '/wiki/List_of_tz_database_time_zones">https://en.wikipedia.org/wiki/List_of_tz_database_time_zones</a>\n'
+        "for a comprehensive list of possible values for this setting.</p>\n<p>If null, the timezone will default "
+        "to UTC and can be set imperatively\nusing timedatectl.</p>\n</rendered-html>"
+    ),
+    "<p>a</p><p>b</p>",
+    "<p>a</p>\n\n  <p>b</p>",
+    "foo <code>bar</code> baz",
+    "a &amp; b &lt;name&gt; &#x27;q&#39;",
+    "x < y and y > z",
+    "<pre>  \n  </pre>x",
+    "<!-- comment -->hi<br/>there",
+    "<script>var x = 1;</script>text<style>a {}</style>",
+    "<ul><li>one</li>\n<li>two &amp; three</li></ul>",
+    "<![CDATA[x]]>y",
+    "<!DOCTYPE html><p>unterminated",
+]
+
+
+@pytest.mark.parametrize("html", SAMPLES)
+def test_html_to_text_matches_beautifulsoup(html):
+    """The streaming extractor produces the same text as BeautifulSoup's get_text."""
+    expected = BeautifulSoup(html, "html.parser").get_text(separator=" ").strip()
+    assert html_to_text(html) == expected
+
+
+def test_html_to_text_empty():
+    assert html_to_text("") == ""
+
+
+def test_render_html_fields_only_touches_given_fields():
+    record = {"name": "<b>x</b>", "description": "<p>Some <em>text</em></p>", "default": None}
+    rendered = render_html_fields(record, ("description", "default"))
+
+    assert rendered == {"name": "<b>x</b>", "description": "Some  text", "default": None}
+    assert record["description"] == "<p>Some <em>text</em></p>"
@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""Tests for warm module."""
+
+import mcp_nix
+from mcp_nix import warm
+
+
+def test_warm_reports_failures_without_stopping(monkeypatch):
+    """A failing artifact is reported and skips its dependents; the others still run."""
+
+    def fail():
+        raise RuntimeError("unreachable")
+
+    warmed = []
+    monkeypatch.setattr(
+        warm,
+        "_config_artifacts",
+        lambda projects, noogle: {"nixos: search config and channels": fail, "other": lambda: warmed.append(1)},
+    )
+    monkeypatch.setattr(warm, "_dependent_artifacts", lambda projects: {p: lambda: None for p in sorted(projects)})
+
+    results = warm.warm(["nixos", "homemanager"])
+
+    assert [(r.artifact, r.error) for r in results] == [
+        ("nixos: search config and channels", "unreachable"),
+        ("other", None),
+        ("homemanager", None),
+    ]
+    assert warmed == [1]
+
+
+def test_warm_in_background_skips_excluded_tools(monkeypatch):
+    started = []
+
+    class Thread:
+        def __init__(self, target, kwargs, **options):
+            self.kwargs = kwargs
+
+        def start(self):
+            started.append(self.kwargs)
+
+    monkeypatch.setattr(mcp_nix.threading, "Thread", Thread)
+
+    mcp_nix._warm_in_background({"search_nixpkgs", "search_nix_stdlib"})
+    mcp_nix._warm_in_background({"find_nixpkgs_commit_with_package_version"})
+
+    assert [(kwargs["projects"], kwargs["noogle"]) for kwargs in started] == [(["nixos"], True)]